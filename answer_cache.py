@@ -0,0 +1,77 @@
+#!/usr/bin/python
+################################################################################
+# Answer cache for read-only questions.
+#
+# Every entry is keyed by the generated SQL and its parameters and remembers
+# which relations (my_* tables) it has read. A write into a relation drops
+# only the entries depending on it; the least recently used entry is evicted
+# once the cache is full.
+
+from collections import OrderedDict, defaultdict
+
+class AnswerCache(object):
+    def __init__(self, capacity = 256):
+        self.capacity = capacity
+
+        self.entries = OrderedDict() # (query, parameters) -> (rows, relations)
+        self.dependents = defaultdict(set) # relation -> set of keys
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, query, parameters = ()):
+        key = (query, tuple(parameters))
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        rows, relations = self.entries.pop(key)
+        self.entries[key] = (rows, relations)
+        return rows
+
+    def put(self, query, parameters, rows, relations):
+        if self.capacity <= 0:
+            return
+        key = (query, tuple(parameters))
+        if key in self.entries:
+            self._remove(key)
+        while len(self.entries) >= self.capacity:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+        self.entries[key] = (list(rows), frozenset(relations))
+        for relation in relations:
+            self.dependents[relation].add(key)
+
+    def invalidate(self, relations):
+        for relation in relations:
+            for key in list(self.dependents.pop(relation, ())):
+                if key in self.entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.dependents.clear()
+
+    def statistics(self):
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions
+        }
+
+    def _remove(self, key):
+        rows, relations = self.entries.pop(key)
+        for relation in relations:
+            self.dependents[relation].discard(key)
+            if not self.dependents[relation]:
+                del self.dependents[relation]
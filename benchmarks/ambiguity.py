@@ -0,0 +1,50 @@
+#!/usr/bin/python
+################################################################################
+# Parse tree enumeration on ambiguous coordinations ("what does pizza and
+# ... and pizza consist of", the number of trees grows as Catalan numbers):
+# all trees, the first tree plus an ambiguity flag, and the best scoring
+# tree plus the number of trees.
+#
+# Usage: python benchmarks/ambiguity.py [N ...]
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import earley
+import profiling
+import repl
+
+# Full enumeration of longer coordinations takes minutes.
+MAX_ALL_TREES = 12
+
+def measure(grammar, text, max_trees):
+    profile = profiling.Profile()
+    started = time.time()
+    earley.parse(grammar, text, profile, max_trees = max_trees)
+    return profile.counters["trees"], time.time() - started
+
+def measure_best(grammar, text):
+    started = time.time()
+    variant, count = earley.parse_best(grammar, text)
+    return count, time.time() - started
+
+if __name__ == "__main__":
+    sizes = map(int, sys.argv[1:]) or [ 4, 6, 8, 10, 12, 20 ]
+
+    grammar = repl.load_grammar(os.path.join(ROOT, "repl.txt"), os.path.join(ROOT, "repl.lex"))
+
+    print "%9s %12s %12s %12s %12s" % ("conjuncts", "trees", "ms/all", "ms/first", "ms/best")
+    for n in sizes:
+        text = " ".join(repl.tokenize("what does %s consist of" % " and ".join([ "pizza" ] * n)))
+        first_trees, first_elapsed = measure(grammar, text, 2)
+        trees, best_elapsed = measure_best(grammar, text)
+        if n <= MAX_ALL_TREES:
+            all_trees, elapsed = measure(grammar, text, None)
+            assert all_trees == trees
+            print "%9d %12d %12.1f %12.1f %12.1f" % (n, trees, elapsed * 1000, first_elapsed * 1000, best_elapsed * 1000)
+        else:
+            print "%9d %12d %12s %12.1f %12.1f" % (n, trees, "-", first_elapsed * 1000, best_elapsed * 1000)
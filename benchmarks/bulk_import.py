@@ -0,0 +1,80 @@
+#!/usr/bin/python
+################################################################################
+# Facts loaded per second by stating them in English through the parser, the
+# way the REPL does ("pizza consists of cheese"), and by bulk_import.py from
+# a CSV file of the same facts.
+#
+# Usage: python benchmarks/bulk_import.py [FACTS]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import itertools
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import bulk_import
+import connection_pool
+import entity_index
+import logic_to_sql
+import lr
+import repl
+
+from grammar_loading import words
+
+# Stating facts in English takes minutes beyond this.
+MAX_SENTENCES = 2000
+
+def facts(count, entities):
+    nouns = [ word for word in itertools.islice(words(), 2000) if not entities.is_known(word) ]
+    for n in range(count):
+        yield nouns[n % len(nouns)], nouns[(n * 7919 + 1) % len(nouns)]
+
+def create(directory, name):
+    pool = connection_pool.ConnectionPool(os.path.join(directory, name))
+    for predicate in repl.SCHEMA:
+        for query in predicate.make_create():
+            pool.write(query)
+    return pool
+
+def state(pool, table, entities, count):
+    started = time.time()
+    for dish, ingredient in facts(count, entities):
+        (semantics, tree), parses = lr.parse_best_stream(table, repl.tokenize("%s consists of %s" % (dish, ingredient)))
+        for query, parameters in logic_to_sql.SqlGenerator().make_sql(semantics.simplify()):
+            pool.write(query, parameters)
+    return count / (time.time() - started)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    grammar = repl.load_grammar(os.path.join(ROOT, "repl.txt"), os.path.join(ROOT, "repl.lex"))
+    entities = entity_index.EntityIndex(normalizer = repl.NORMALIZER)
+    entities.attach(grammar)
+    table = lr.ParseTable(grammar)
+    for dish, ingredient in facts(min(count, MAX_SENTENCES), entities):
+        entities.add(dish.capitalize())
+        entities.add(ingredient.capitalize())
+
+    directory = tempfile.mkdtemp()
+    try:
+        pool = create(directory, "sentences.db")
+        sentences = state(pool, table, entities, min(count, MAX_SENTENCES))
+        pool.close()
+
+        path = os.path.join(directory, "facts.csv")
+        with open(path, "w") as output:
+            for dish, ingredient in facts(count, entities):
+                output.write("Consists,%s,%s\n" % (dish.capitalize(), ingredient.capitalize()))
+        pool = create(directory, "bulk.db")
+        statistics, seconds = bulk_import.Importer(pool).load([ path ])
+        pool.close()
+
+        print "%-10s %12s %12s" % ("", "facts", "facts/s")
+        print "%-10s %12d %12.0f" % ("sentences", min(count, MAX_SENTENCES), sentences)
+        print "%-10s %12d %12.0f" % ("bulk", sum(statistics.values()), sum(statistics.values()) / seconds)
+    finally:
+        shutil.rmtree(directory)
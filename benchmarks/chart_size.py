@@ -0,0 +1,51 @@
+#!/usr/bin/python
+################################################################################
+# Chart size with and without FIRST set lookahead filtering of predictions.
+#
+# Usage: python benchmarks/chart_size.py [scenario.txt]
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import earley
+import profiling
+import repl
+
+def measure(grammar, questions, lookahead):
+    states = 0
+    predictions = 0
+    started = time.time()
+    for question in questions:
+        profile = profiling.Profile(question)
+        earley.parse(grammar, question, profile, lookahead = lookahead)
+        states += profile.counters["states"]
+        predictions += profile.counters["predictions"]
+    return states, predictions, time.time() - started
+
+if __name__ == "__main__":
+    scenario = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "scenario.txt")
+
+    grammar = repl.load_grammar(os.path.join(ROOT, "repl.txt"), os.path.join(ROOT, "repl.lex"))
+    questions = [ line.strip() for line in open(scenario, "r") ]
+    questions = [ " ".join(repl.tokenize(line)) for line in questions if line and not line.startswith(".") ]
+
+    print "%-45s %8s %8s" % ("question", "before", "after")
+    for question in questions:
+        before = profiling.Profile()
+        after = profiling.Profile()
+        earley.parse(grammar, question, before, lookahead = False)
+        earley.parse(grammar, question, after, lookahead = True)
+        print "%-45s %8d %8d" % (question, before.counters["states"], after.counters["states"])
+
+    states_before, predictions_before, time_before = measure(grammar, questions, False)
+    states_after, predictions_after, time_after = measure(grammar, questions, True)
+
+    print
+    print "chart states: %d -> %d (%.1f%% pruned)" % (
+        states_before, states_after, 100.0 * (states_before - states_after) / states_before)
+    print "predictions:  %d -> %d" % (predictions_before, predictions_after)
+    print "parse time:   %.1f ms -> %.1f ms" % (time_before * 1000, time_after * 1000)
@@ -0,0 +1,45 @@
+#!/usr/bin/python
+################################################################################
+# Grammar loading throughput on repl.txt extended with generated lexical
+# lines (one dish or ingredient per line, plus verb forms sharing semantics).
+#
+# Usage: python benchmarks/grammar_loading.py [LINES]
+
+import os
+import sys
+import time
+import string
+import itertools
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import earley
+import repl
+
+def words():
+    for length in itertools.count(3):
+        for letters in itertools.product(string.ascii_lowercase, repeat = length):
+            yield "".join(letters)
+
+def generate(count):
+    lines = []
+    for n, word in enumerate(itertools.islice(words(), count)):
+        if n % 10 == 0:
+            lines.append("V/TRANS::(\\y.\\x.Consists(x,y)) -> %s" % word)
+        else:
+            lines.append("N::%s -> %s" % (word.capitalize(), word))
+    return lines
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    lines = repl.filter_comments(open(os.path.join(ROOT, "repl.txt"), "r").readlines()) + generate(count) + \
+        [ "N::Pizza -> pizza", "N::Cheese -> cheese" ]
+
+    started = time.time()
+    grammar = earley.load_grammar(lines)
+    elapsed = time.time() - started
+
+    print "%d lines in %.2f s: %.0f lines/s" % (len(lines), elapsed, len(lines) / elapsed)
+    print earley.parse(grammar, "pizza consist of cheese")[0][0].simplify()
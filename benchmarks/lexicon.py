@@ -0,0 +1,72 @@
+#!/usr/bin/python
+################################################################################
+# Startup and parse time with a large vocabulary of generated nouns, kept
+# either as lexical lines of the grammar or in a memory-mapped lexicon file.
+#
+# Usage: python benchmarks/lexicon.py [WORDS]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import itertools
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import earley
+import lexicon
+import repl
+
+from grammar_loading import words
+
+# In normal forms (see normalization.py), since generated words are not.
+QUESTIONS = [ "pizza consist of cheese", "is %s vegetarian", "what do %s consist of", "%s consist of %s and tomato" ]
+
+# Loading larger vocabularies as grammar lines takes minutes.
+MAX_GRAMMAR_WORDS = 100000
+
+def entries(count):
+    for word in itertools.islice(words(), count):
+        yield word, "N", word.capitalize()
+
+def measure(grammar, vocabulary):
+    started = time.time()
+    for n, question in enumerate(QUESTIONS * 25):
+        samples = vocabulary[(n * 7919) % len(vocabulary)], vocabulary[(n * 104729) % len(vocabulary)]
+        question = question % samples[:question.count("%s")]
+        assert len(earley.parse(grammar, question)) > 0, question
+    return (time.time() - started) * 1000 / (len(QUESTIONS) * 25)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "benchmark.lex")
+        started = time.time()
+        lexicon.write(path, list(entries(count)) + [
+            tuple(line.rstrip("\n").split("\t")) for line in open(os.path.join(ROOT, "repl.lex"), "r").readlines()[1:] ])
+        print "lexicon of %d words written in %.1f s (%.1f MB)" % (
+            count, time.time() - started, os.path.getsize(path) / 1048576.0)
+
+        vocabulary = [ word for word, category, semantics in entries(count) ]
+
+        started = time.time()
+        grammar = repl.load_grammar(os.path.join(ROOT, "repl.txt"), path)
+        lexicon_startup = time.time() - started
+        lexicon_parse = measure(grammar, vocabulary)
+
+        print "%-10s %12s %12s" % ("", "startup, s", "ms/question")
+        if count <= MAX_GRAMMAR_WORDS:
+            lines = repl.filter_comments(open(os.path.join(ROOT, "repl.txt"), "r").readlines()) + \
+                [ "N::%s -> %s" % (semantics, word) for word, category, semantics in entries(count) ] + \
+                [ "N::Pizza -> pizza", "N::Cheese -> cheese", "N::Tomato -> tomato", "N::Vegetarian -> vegetarian" ]
+            started = time.time()
+            grammar = earley.load_grammar(lines)
+            grammar_startup = time.time() - started
+            print "%-10s %12.3f %12.2f" % ("grammar", grammar_startup, measure(grammar, vocabulary))
+        print "%-10s %12.3f %12.2f" % ("lexicon", lexicon_startup, lexicon_parse)
+    finally:
+        shutil.rmtree(directory)
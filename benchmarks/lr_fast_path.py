@@ -0,0 +1,75 @@
+#!/usr/bin/python
+################################################################################
+# Share of questions served by the LR(1) table fast path and its speedup over
+# the Earley parser. Questions are read from scenario files (one question per
+# line) or from traces written by the REPL and the query server (profile.jsonl).
+#
+# Usage: python benchmarks/lr_fast_path.py [scenario.txt | profile.jsonl ...]
+
+import os
+import sys
+import json
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import earley
+import lr
+import repl
+
+REPEAT = 20
+
+def read_questions(path):
+    questions = []
+    for line in open(path, "r"):
+        line = line.strip()
+        if path.endswith(".jsonl"):
+            line = json.loads(line)["question"] if line else ""
+        if line and not line.startswith("."):
+            questions.append(line)
+    return questions
+
+def measure(function, tokens):
+    started = time.time()
+    for n in range(REPEAT):
+        try:
+            function(tokens)
+        except earley.ParseError:
+            pass
+    return (time.time() - started) / REPEAT
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or [ os.path.join(ROOT, "scenario.txt") ]
+
+    grammar = repl.load_grammar(os.path.join(ROOT, "repl.txt"), os.path.join(ROOT, "repl.lex"))
+    started = time.time()
+    table = lr.ParseTable(grammar)
+    print "table: %d states, %d conflicting cells, built in %.1f ms" % (
+        len(table.action), len(list(table.conflicts())), (time.time() - started) * 1000)
+    print
+
+    questions = sum((read_questions(path) for path in paths), [])
+
+    served = 0
+    total_earley = 0.0
+    total_fast = 0.0
+    print "%-45s %6s %10s %10s %8s" % ("question", "path", "ms/earley", "ms/table", "speedup")
+    for question in questions:
+        tokens = repl.tokenize(question)
+        try:
+            table.parse(tokens)
+            path = "table"
+            served += 1
+        except lr.Conflict:
+            path = "earley"
+        elapsed_earley = measure(lambda tokens: earley.parse_best_stream(grammar, tokens), tokens)
+        elapsed_fast = measure(lambda tokens: lr.parse_best_stream(table, tokens), tokens)
+        total_earley += elapsed_earley
+        total_fast += elapsed_fast
+        print "%-45s %6s %10.3f %10.3f %7.1fx" % (
+            question, path, elapsed_earley * 1000, elapsed_fast * 1000, elapsed_earley / elapsed_fast)
+
+    print
+    print "served by the table: %d of %d (%.1f%%)" % (served, len(questions), 100.0 * served / len(questions))
+    print "total: %.1f ms -> %.1f ms (%.1fx)" % (total_earley * 1000, total_fast * 1000, total_earley / total_fast)
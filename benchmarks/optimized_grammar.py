@@ -0,0 +1,59 @@
+#!/usr/bin/python
+################################################################################
+# Chart size and parse time on the scenario with the grammar as written and
+# after grammar_optimizer.optimize().
+#
+# Usage: python benchmarks/optimized_grammar.py [scenario.txt]
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import earley
+import grammar_optimizer
+import lr
+import profiling
+import repl
+
+REPEAT = 20
+
+def measure(grammar, questions):
+    states = 0
+    started = time.time()
+    for n in range(REPEAT):
+        for question in questions:
+            profile = profiling.Profile(question)
+            earley.parse(grammar, question, profile)
+            states += profile.counters["states"]
+    return states / REPEAT, (time.time() - started) / REPEAT
+
+def served(grammar, questions):
+    table = lr.ParseTable(grammar)
+    count = 0
+    for question in questions:
+        try:
+            table.parse(earley.tokenize(question))
+            count += 1
+        except lr.Conflict:
+            pass
+    return count
+
+if __name__ == "__main__":
+    scenario = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "scenario.txt")
+
+    grammar = repl.load_grammar(os.path.join(ROOT, "repl.txt"), os.path.join(ROOT, "repl.lex"))
+    optimized, report = grammar_optimizer.optimize(grammar)
+    questions = [ line.strip() for line in open(scenario, "r") ]
+    questions = [ " ".join(repl.tokenize(line)) for line in questions if line and not line.startswith(".") ]
+
+    states_before, time_before = measure(grammar, questions)
+    states_after, time_after = measure(optimized, questions)
+
+    print "chart states:    %d -> %d (%.1f%% fewer)" % (
+        states_before, states_after, 100.0 * (states_before - states_after) / states_before)
+    print "parse time:      %.1f ms -> %.1f ms" % (time_before * 1000, time_after * 1000)
+    print "LR fast path:    %d -> %d of %d questions" % (
+        served(grammar, questions), served(optimized, questions), len(questions))
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+################################################################################
+# Chart size and parse time on right-recursive coordinations ("x and x and
+# ... and x") with and without Leo items.
+#
+# Usage: python benchmarks/right_recursion.py [N ...]
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import earley
+import profiling
+
+# Parse trees of long coordinations are deep.
+sys.setrecursionlimit(100000)
+
+GRAMMARS = [
+    ("syntax only", [
+        "S -> L",
+        "L -> item",
+        "L -> item AND L",
+        "AND -> and" ]),
+    ("with semantics", [
+        "S::(A) -> L:=A",
+        "L::(\\x.Item(x)) -> item",
+        "L::(\\x.Item(x)&&B(x)) -> item AND L:=B",
+        "AND -> and" ])
+]
+
+# Without Leo items longer inputs take minutes.
+MAX_WITHOUT_LEO = 300
+
+def measure(grammar, text, leo):
+    profile = profiling.Profile()
+    started = time.time()
+    variants = earley.parse(grammar, text, profile, leo = leo)
+    assert len(variants) == 1
+    return profile.counters["states"], time.time() - started
+
+if __name__ == "__main__":
+    sizes = map(int, sys.argv[1:]) or [ 10, 30, 100, 300, 1000 ]
+
+    for name, lines in GRAMMARS:
+        grammar = earley.load_grammar(lines)
+        print "%s:" % name
+        print "%9s %12s %12s %12s %12s" % ("conjuncts", "states", "states/leo", "ms", "ms/leo")
+        for n in sizes:
+            text = " and ".join([ "item" ] * n)
+            states_leo, elapsed_leo = measure(grammar, text, True)
+            if n <= MAX_WITHOUT_LEO:
+                states, elapsed = measure(grammar, text, False)
+                print "%9d %12d %12d %12.1f %12.1f" % (n, states, states_leo, elapsed * 1000, elapsed_leo * 1000)
+            else:
+                print "%9d %12s %12d %12s %12.1f" % (n, "-", states_leo, "-", elapsed_leo * 1000)
+        print
@@ -0,0 +1,53 @@
+#!/usr/bin/python
+################################################################################
+# Word-by-word type-ahead over the scenario: a full parse of every prefix
+# versus an incremental parse session which reuses the common prefix.
+#
+# Usage: python benchmarks/typeahead.py [scenario.txt]
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import earley
+import repl
+
+def prefixes(question):
+    words = question.split()
+    return [ " ".join(words[:n]) for n in range(1, len(words) + 1) ]
+
+def from_scratch(grammar, questions):
+    started = time.time()
+    for question in questions:
+        for prefix in prefixes(question):
+            earley.parse(grammar, prefix)
+    return time.time() - started
+
+def incremental(grammar, questions):
+    started = time.time()
+    session = earley.ParseSession(grammar)
+    for question in questions:
+        for prefix in prefixes(question):
+            session.update(prefix)
+            session.expected()
+            session.parses()
+    return time.time() - started
+
+if __name__ == "__main__":
+    scenario = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "scenario.txt")
+
+    grammar = repl.load_grammar(os.path.join(ROOT, "repl.txt"), os.path.join(ROOT, "repl.lex"))
+    questions = [ line.strip() for line in open(scenario, "r") ]
+    questions = [ " ".join(repl.tokenize(line)) for line in questions if line and not line.startswith(".") ]
+
+    count = sum(len(prefixes(question)) for question in questions)
+    elapsed_scratch = from_scratch(grammar, questions)
+    elapsed_incremental = incremental(grammar, questions)
+
+    print "prefixes:     %d" % count
+    print "from scratch: %.1f ms (%.2f ms per prefix)" % (elapsed_scratch * 1000, elapsed_scratch * 1000 / count)
+    print "incremental:  %.1f ms (%.2f ms per prefix, with expected words)" % (
+        elapsed_incremental * 1000, elapsed_incremental * 1000 / count)
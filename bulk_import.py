@@ -0,0 +1,201 @@
+#!/usr/bin/python
+################################################################################
+# Bulk import of facts into the knowledge base, without the parser.
+#
+# Facts are read from CSV files, a predicate and its arguments per row,
+#   Consists,Pizza,Cheese
+#   Consists,Pizza,Tomato,200
+# or from JSON lines files, a list or an object per line:
+#   ["Have", "Tomato", 20]
+#   {"predicate": "Costs", "args": ["Tomato", 2]}
+# Empty lines and lines starting with '#' are skipped.
+#
+# Every fact is checked against the schema (see schema.py): the predicate
+# must be known, take as many arguments and have numbers where its columns
+# are numeric. Text arguments are stored as the parser writes symbols, so
+# that questions find them: "olive oil" becomes Oliveoil, as in the lexicon;
+# anything else than letters is rejected.
+#
+# The files are read once. Facts are inserted as they are checked, with
+# executemany() in batches of BATCH_SIZE rows, all in a single transaction
+# which is rolled back at the first invalid fact, so nothing is written
+# unless all of them are valid. Indexes and materialized counters (see
+# counters.py) of the tables loaded are dropped when their first fact comes
+# and rebuilt once after the last, instead of being updated for every row.
+#
+# Usage: python bulk_import.py [--database example.db] FILE...
+
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+
+import counters
+import connection_pool
+import logic
+import numerals
+import schema
+
+# Rows inserted per executemany().
+BATCH_SIZE = 50000
+
+NUMERIC_TYPES = [ "NUMBER", "INTEGER", "REAL" ]
+
+# (line, predicate, arguments) of every fact of a file.
+def read_facts(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".csv", ".jsonl", ".json"):
+        raise RuntimeError, "Unable to import '{0}': only .csv and .jsonl files are supported".format(path)
+    try:
+        with open(path, "rb") as input:
+            if extension == ".csv":
+                for line, row in enumerate(csv.reader(input), 1):
+                    while len(row) > 0 and row[-1].strip() == "":
+                        row.pop()
+                    if len(row) == 0 or row[0].lstrip().startswith("#"):
+                        continue
+                    yield line, row[0].strip(), [ value.strip() for value in row[1:] ]
+            else:
+                for line, text in enumerate(input, 1):
+                    if text.strip() == "" or text.lstrip().startswith("#"):
+                        continue
+                    try:
+                        fact = json.loads(text)
+                    except ValueError:
+                        raise RuntimeError, "{0}:{1}: invalid JSON".format(path, line)
+                    if isinstance(fact, dict):
+                        yield line, fact.get("predicate"), fact.get("args", [])
+                    elif isinstance(fact, list) and len(fact) > 0:
+                        yield line, fact[0], fact[1:]
+                    else:
+                        raise RuntimeError, "{0}:{1}: a fact is a list or an object".format(path, line)
+    except EnvironmentError as e:
+        raise RuntimeError, "Unable to import '{0}': {1}".format(path, e.strerror or e)
+
+def convert(type, value):
+    if type in NUMERIC_TYPES:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, long, float)):
+            return value
+        if isinstance(value, basestring):
+            return numerals.parse_digits(value)
+        return None
+    if isinstance(value, basestring):
+        symbol = "".join(value.split()).capitalize()
+        if logic.is_symbol(symbol):
+            return str(symbol)
+    return None
+
+# The predicate and the values of a fact, checked against the schema.
+def validate(registry, path, line, name, arguments):
+    if not isinstance(name, basestring) or name not in registry:
+        raise RuntimeError, "{0}:{1}: unknown predicate {2}".format(path, line, json.dumps(name))
+    predicate = registry.predicate(name)
+    if not 1 <= len(arguments) <= len(predicate):
+        raise RuntimeError, "{0}:{1}: '{2}' takes 1 to {3} arguments, not {4}".format(
+            path, line, name, len(predicate), len(arguments))
+    values = []
+    for n, argument in enumerate(arguments):
+        value = convert(predicate.columns[n], argument)
+        if value is None:
+            raise RuntimeError, "{0}:{1}: argument {2} of '{3}' is not a {4} value: {5}".format(
+                path, line, n + 1, name, predicate.columns[n], json.dumps(argument))
+        values.append(value)
+    return predicate, tuple(values)
+
+def make_insert(predicate, width):
+    return "INSERT INTO {0}({1}) VALUES ({2})".format(
+        predicate.table, ", ".join(predicate.column(n) for n in range(width)), ", ".join([ "?" ] * width))
+
+class Importer(object):
+    def __init__(self, pool, registry = None, use_counters = False, batch_size = BATCH_SIZE):
+        self.pool = pool
+        self.schema = registry if registry is not None else schema.default()
+        self.use_counters = use_counters
+        self.batch_size = batch_size
+
+    def facts(self, paths):
+        for path in paths:
+            for line, name, arguments in read_facts(path):
+                yield validate(self.schema, path, line, name, arguments)
+
+    # The table of a predicate is created, if need be, and its indexes and
+    # counters are gone during the load.
+    def _prepare(self, connection, predicate):
+        for query in predicate.make_create_table(self.pool.columns(predicate.table)):
+            connection.execute(query)
+        for query in predicate.make_drop_indexes():
+            connection.execute(query)
+        if self.use_counters:
+            for query in counters.make_drop_relation_counters([ predicate ], self.schema.totals):
+                connection.execute(query)
+
+    # Counters are only computed again for the relations loaded, the others
+    # are kept (see counters.py).
+    def _finish(self, connection, predicates):
+        for predicate in predicates:
+            for query in predicate.make_create_indexes():
+                connection.execute(query)
+        if self.use_counters:
+            for query in counters.make_create_counters(self.schema.aggregated(), self.schema.totals):
+                connection.execute(query)
+
+    def _flush(self, connection, pending):
+        for (predicate, width), rows in pending.iteritems():
+            connection.executemany(make_insert(predicate, width), rows)
+        pending.clear()
+
+    # Imports the facts of the files; returns the number of facts of every
+    # table and the time it took. Nothing is written unless all the facts
+    # are valid.
+    def load(self, paths):
+        started = time.time()
+
+        predicates = []
+        statistics = {}
+        with self.pool.transaction() as connection:
+            pending = {}
+            size = 0
+            for predicate, values in self.facts(paths):
+                if predicate not in predicates:
+                    self._prepare(connection, predicate)
+                    predicates.append(predicate)
+                    statistics[predicate.table] = 0
+                pending.setdefault((predicate, len(values)), []).append(values)
+                statistics[predicate.table] += 1
+                size += 1
+                if size >= self.batch_size:
+                    self._flush(connection, pending)
+                    size = 0
+            self._flush(connection, pending)
+            self._finish(connection, predicates)
+
+        return statistics, time.time() - started
+
+def report(statistics, seconds):
+    rows = sum(statistics.values())
+    return "Imported {0} facts in {1:.2f} s ({2:.0f} rows/s): {3}.".format(
+        rows, seconds, rows / max(seconds, 1e-6),
+        ", ".join("%s %d" % (table, count) for table, count in sorted(statistics.items())) or "nothing")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Imports facts from CSV and JSON lines files.")
+    parser.add_argument("--database", default = "example.db")
+    parser.add_argument("--batch-size", dest = "batch_size", type = int, default = BATCH_SIZE)
+    parser.add_argument("paths", nargs = "+", metavar = "FILE")
+    args = parser.parse_args()
+
+    pool = connection_pool.ConnectionPool(args.database)
+    try:
+        use_counters = len(pool.read(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (counters.COUNTERS_TABLE,))) > 0
+        importer = Importer(pool, use_counters = use_counters, batch_size = args.batch_size)
+        print report(*importer.load(args.paths))
+    except RuntimeError as e:
+        print >> sys.stderr, e
+        sys.exit(1)
+    finally:
+        pool.close()
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+################################################################################
+# SQLite connection pool.
+#
+# The database is opened in WAL mode: readers see the last committed state
+# and are never blocked by the writer. Every thread gets its own read-only
+# connection; all writes go through a single shared connection guarded by a
+# lock, so there is never more than one writer.
+
+import sqlite3
+import threading
+import contextlib
+
+class ConnectionPool(object):
+    PRAGMAS = [
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"), # Durable enough with WAL, fsyncs only on checkpoints.
+        ("cache_size", -16384),    # 16MB of page cache per connection.
+        ("mmap_size", 268435456),  # Read pages straight from a 256MB mapping.
+        ("busy_timeout", 5000)
+    ]
+
+    def __init__(self, database, pragmas = None):
+        self.database = database
+        self.pragmas = pragmas if pragmas is not None else self.PRAGMAS
+
+        self.local = threading.local()
+        self.lock = threading.RLock()
+
+        self.readers = []
+        self.writer = self._connect()
+
+    def _connect(self, read_only = False):
+        connection = sqlite3.connect(self.database, check_same_thread = False)
+        for name, value in self.pragmas:
+            connection.execute("PRAGMA {0}={1}".format(name, value))
+        if read_only:
+            connection.execute("PRAGMA query_only=1")
+        return connection
+
+    def reader(self):
+        if not hasattr(self.local, "reader"):
+            self.local.reader = self._connect(read_only = True)
+            with self.lock:
+                self.readers.append(self.local.reader)
+        return self.local.reader
+
+    def read(self, query, parameters = ()):
+        return self.reader().execute(query, parameters).fetchall()
+
+    def write(self, query, parameters = ()):
+        with self.lock:
+            try:
+                rows = self.writer.execute(query, parameters).fetchall()
+                self.writer.commit()
+            except:
+                self.writer.rollback()
+                raise
+        return rows
+
+    # Gives the writer for a single transaction, committed at the end of the
+    # block or rolled back on error. Unlike write(), CREATE and DROP
+    # statements are part of the transaction too: sqlite3 would otherwise
+    # commit before each of them.
+    @contextlib.contextmanager
+    def transaction(self):
+        with self.lock:
+            isolation_level = self.writer.isolation_level
+            self.writer.isolation_level = None
+            try:
+                self.writer.execute("BEGIN")
+                try:
+                    yield self.writer
+                except:
+                    self.writer.execute("ROLLBACK")
+                    raise
+                self.writer.execute("COMMIT")
+            finally:
+                self.writer.isolation_level = isolation_level
+
+    def columns(self, table):
+        return [ row[1] for row in self.read("PRAGMA table_info({0})".format(table)) ]
+
+    def execute(self, query, parameters = ()):
+        if query.lstrip()[:6].upper() == "SELECT":
+            return self.read(query, parameters)
+        else:
+            return self.write(query, parameters)
+
+    def close(self):
+        with self.lock:
+            for connection in self.readers:
+                connection.close()
+            self.readers = []
+            self.writer.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/python
+################################################################################
+# Materialized aggregate counters.
+#
+# For every relation and every argument position we keep
+#   * the number of rows having a given value at that position
+#     (my_counters; answers "how many dishes consist of cheese"),
+#   * the number of distinct values at that position
+#     (my_distinct_counters; answers "how many dishes are there").
+# Both tables are maintained by triggers on INSERT and DELETE, so the counts
+# stay correct whatever path writes into the relation.
+#
+# For the relation of parts (my_consists) and the one of costs (my_costs)
+# declared as totals in the schema (see schema.py) we also keep the total
+# cost of the parts of every whole (my_totals; answers "how much is pizza"),
+# maintained by triggers on both relations. A whole with a cost of its own
+# ("how much is tomato") is answered with it instead.
+#
+# Relations are given as schema predicates, counted at every argument.
+#
+# Creating counters again, as every .init does, keeps the ones which exist:
+# only counters of arguments which have none yet are computed from the rows,
+# and triggers are replaced, since they hold no state.
+
+COUNTERS_TABLE = "my_counters"
+DISTINCT_COUNTERS_TABLE = "my_distinct_counters"
+TOTALS_TABLE = "my_totals"
+
+# Totals are the (parts, costs) predicates; they are kept if both relations
+# have counters.
+def make_create_counters(predicates, totals = None):
+    yield "CREATE TABLE IF NOT EXISTS {0}(relation TEXT, arg INTEGER, value TEXT, total INTEGER, PRIMARY KEY(relation, arg, value))".format(COUNTERS_TABLE)
+    yield "CREATE TABLE IF NOT EXISTS {0}(relation TEXT, arg INTEGER, total INTEGER, PRIMARY KEY(relation, arg))".format(DISTINCT_COUNTERS_TABLE)
+
+    for predicate in predicates:
+        relation = predicate.table
+        on_insert = []
+        on_delete = []
+        for n in range(len(predicate)):
+            column = predicate.column(n)
+            # Distinct counters probe the relation by value, so index it.
+            yield "CREATE INDEX IF NOT EXISTS {0}_{1}_{2} ON {1}({2})".format(COUNTERS_TABLE, relation, column)
+            # The distinct counter of an argument tells whether it is counted.
+            missing = "NOT EXISTS (SELECT 1 FROM {0} WHERE relation = '{1}' AND arg = {2})".format(
+                DISTINCT_COUNTERS_TABLE, relation, n)
+            yield "INSERT INTO {0} SELECT '{1}', {2}, {3}, COUNT(*) FROM {1} WHERE {3} IS NOT NULL AND {4} GROUP BY {3}".format(
+                COUNTERS_TABLE, relation, n, column, missing)
+            yield "INSERT INTO {0} SELECT '{1}', {2}, (SELECT COUNT(DISTINCT {3}) FROM {1}) WHERE {4}".format(
+                DISTINCT_COUNTERS_TABLE, relation, n, column, missing)
+
+            on_insert.append(
+                "INSERT OR IGNORE INTO {0} SELECT '{1}', {2}, NEW.{3}, 0 WHERE NEW.{3} IS NOT NULL;".format(
+                    COUNTERS_TABLE, relation, n, column))
+            on_insert.append(
+                "UPDATE {0} SET total = total + 1 WHERE relation = '{1}' AND arg = {2} AND value = NEW.{3};".format(
+                    COUNTERS_TABLE, relation, n, column))
+            on_insert.append(
+                "UPDATE {0} SET total = total + 1 WHERE relation = '{1}' AND arg = {2} AND NEW.{3} IS NOT NULL AND "
+                "NOT EXISTS (SELECT 1 FROM {1} WHERE {3} = NEW.{3} AND rowid != NEW.rowid);".format(
+                    DISTINCT_COUNTERS_TABLE, relation, n, column))
+
+            on_delete.append(
+                "UPDATE {0} SET total = total - 1 WHERE relation = '{1}' AND arg = {2} AND value = OLD.{3};".format(
+                    COUNTERS_TABLE, relation, n, column))
+            on_delete.append(
+                "UPDATE {0} SET total = total - 1 WHERE relation = '{1}' AND arg = {2} AND OLD.{3} IS NOT NULL AND "
+                "NOT EXISTS (SELECT 1 FROM {1} WHERE {3} = OLD.{3});".format(
+                    DISTINCT_COUNTERS_TABLE, relation, n, column))
+
+        for query in make_create_trigger("{0}_{1}_insert".format(COUNTERS_TABLE, relation),
+                "AFTER INSERT ON {0}".format(relation), on_insert):
+            yield query
+        for query in make_create_trigger("{0}_{1}_delete".format(COUNTERS_TABLE, relation),
+                "AFTER DELETE ON {0}".format(relation), on_delete):
+            yield query
+
+    tables = [ predicate.table for predicate in predicates ]
+    if totals is not None and all(predicate.table in tables for predicate in totals):
+        for query in make_create_totals(*[ predicate.table for predicate in totals ]):
+            yield query
+
+def make_create_trigger(name, event, statements):
+    yield "DROP TRIGGER IF EXISTS {0}".format(name)
+    yield "CREATE TRIGGER {0} {1} BEGIN {2} END".format(name, event, " ".join(statements))
+
+# Totals are kept for every whole having a part; the costs of a part are
+# added to them once per row relating the whole and the part.
+def make_create_totals(parts, costs):
+    yield "CREATE TABLE IF NOT EXISTS {0}(value TEXT PRIMARY KEY, total NUMBER)".format(TOTALS_TABLE)
+    yield "INSERT INTO {0} SELECT p.arg0, COALESCE(SUM(c.arg1), 0) FROM {1} AS p LEFT JOIN {2} AS c ON c.arg0 = p.arg1 " \
+        "WHERE NOT EXISTS (SELECT 1 FROM {0}) GROUP BY p.arg0".format(TOTALS_TABLE, parts, costs)
+
+    cost = "COALESCE((SELECT SUM(arg1) FROM {0} WHERE arg0 = {{0}}.arg1), 0)".format(costs)
+    for query in make_create_trigger("{0}_{1}_insert".format(TOTALS_TABLE, parts), "AFTER INSERT ON {0}".format(parts), [
+            "INSERT OR IGNORE INTO {0} VALUES (NEW.arg0, 0);".format(TOTALS_TABLE),
+            "UPDATE {0} SET total = total + {1} WHERE value = NEW.arg0;".format(TOTALS_TABLE, cost.format("NEW")) ]):
+        yield query
+    for query in make_create_trigger("{0}_{1}_delete".format(TOTALS_TABLE, parts), "AFTER DELETE ON {0}".format(parts), [
+            "UPDATE {0} SET total = total - {1} WHERE value = OLD.arg0;".format(TOTALS_TABLE, cost.format("OLD")) ]):
+        yield query
+
+    update = "UPDATE {0} SET total = total {{1}} {{0}}.arg1 * (SELECT COUNT(*) FROM {1} WHERE arg0 = {0}.value AND arg1 = {{0}}.arg0) " \
+        "WHERE value IN (SELECT arg0 FROM {1} WHERE arg1 = {{0}}.arg0);".format(TOTALS_TABLE, parts)
+    for query in make_create_trigger("{0}_{1}_insert".format(TOTALS_TABLE, costs), "AFTER INSERT ON {0}".format(costs),
+            [ update.format("NEW", "+") ]):
+        yield query
+    for query in make_create_trigger("{0}_{1}_delete".format(TOTALS_TABLE, costs), "AFTER DELETE ON {0}".format(costs),
+            [ update.format("OLD", "-") ]):
+        yield query
+
+def make_drop_counters(predicates):
+    for predicate in predicates:
+        relation = predicate.table
+        yield "DROP TRIGGER IF EXISTS {0}_{1}_insert".format(COUNTERS_TABLE, relation)
+        yield "DROP TRIGGER IF EXISTS {0}_{1}_delete".format(COUNTERS_TABLE, relation)
+        yield "DROP TRIGGER IF EXISTS {0}_{1}_insert".format(TOTALS_TABLE, relation)
+        yield "DROP TRIGGER IF EXISTS {0}_{1}_delete".format(TOTALS_TABLE, relation)
+        for n in range(len(predicate)):
+            yield "DROP INDEX IF EXISTS {0}_{1}_{2}".format(COUNTERS_TABLE, relation, predicate.column(n))
+    yield "DROP TABLE IF EXISTS {0}".format(COUNTERS_TABLE)
+    yield "DROP TABLE IF EXISTS {0}".format(DISTINCT_COUNTERS_TABLE)
+    yield "DROP TABLE IF EXISTS {0}".format(TOTALS_TABLE)
+
+# Drops the counters of some relations only, as while loading them (see
+# bulk_import.py), and the totals if they are kept over one of them.
+# Creating the counters again then computes just these from the rows.
+def make_drop_relation_counters(predicates, totals = None):
+    for predicate in predicates:
+        relation = predicate.table
+        yield "DROP TRIGGER IF EXISTS {0}_{1}_insert".format(COUNTERS_TABLE, relation)
+        yield "DROP TRIGGER IF EXISTS {0}_{1}_delete".format(COUNTERS_TABLE, relation)
+        for n in range(len(predicate)):
+            yield "DROP INDEX IF EXISTS {0}_{1}_{2}".format(COUNTERS_TABLE, relation, predicate.column(n))
+        yield "DELETE FROM {0} WHERE relation = '{1}'".format(COUNTERS_TABLE, relation)
+        yield "DELETE FROM {0} WHERE relation = '{1}'".format(DISTINCT_COUNTERS_TABLE, relation)
+    if totals is not None and any(predicate in predicates for predicate in totals):
+        for predicate in totals:
+            yield "DROP TRIGGER IF EXISTS {0}_{1}_insert".format(TOTALS_TABLE, predicate.table)
+            yield "DROP TRIGGER IF EXISTS {0}_{1}_delete".format(TOTALS_TABLE, predicate.table)
+        yield "DROP TABLE IF EXISTS {0}".format(TOTALS_TABLE)
+
+def make_count_lookup(relation, n, value):
+    return "SELECT COALESCE((SELECT total FROM {0} WHERE relation = '{1}' AND arg = {2} AND value = {3}), 0)".format(
+        COUNTERS_TABLE, relation, n, value)
+
+# A whole with a cost of its own (an ingredient) costs that much, otherwise
+# the total of its parts.
+def make_total_lookup(costs, value):
+    return "SELECT COALESCE((SELECT SUM(arg1) FROM {0} WHERE arg0 = {2}), (SELECT total FROM {1} WHERE value = {2}), 0)".format(
+        costs, TOTALS_TABLE, value)
+
+def make_distinct_count_lookup(relation, n):
+    return "SELECT COALESCE((SELECT total FROM {0} WHERE relation = '{1}' AND arg = {2}), 0)".format(
+        DISTINCT_COUNTERS_TABLE, relation, n)
@@ -26,18 +26,29 @@
 # ("S", [ [ "NP" "VP" ] ]), ("NP", [ [ "D", "N" ], [ "John"] ]), ...
 #   are rules.
 
-import re
+import string
 import itertools
 import operator
 
 import logic
 import logic_ast_nodes
+import profiling
 
 class Production(object):
     def __init__(self, semantics, *terms, **kwargs):
         self.semantics = semantics # This is a semantic expression for the production.
         self.terms = terms # This is a list of terms with corresponding semantic variables.
         self.safe_bindings = kwargs["safe_bindings"] if "safe_bindings" in kwargs else True
+        # Relative preference of the production; the score of a derivation
+        # is the product of the weights of its productions.
+        self.weight = kwargs["weight"] if "weight" in kwargs else 1.0
+
+        # Terminals which may start the production and whether it derives
+        # the empty string; filled in by compute_first_sets().
+        self.first = None
+        self.nullable = False
+        # Lexical terms (see LexicalTerm) which may start the production.
+        self.lexical_first = ()
 
     def __len__(self):
         return len(self.terms)
@@ -51,7 +62,8 @@ class Production(object):
     def __repr__(self):
         return \
             ("(:" + str(self.semantics) + ") " if self.semantics else "") + \
-            " ".join(str(t) + (":" + str(s) if s else "") for t, s in self.terms)
+            " ".join(str(t) + (":" + str(s) if s else "") for t, s in self.terms) + \
+            (" @" + str(self.weight) if self.weight != 1.0 else "")
 
     def __eq__(self, other):
         if not isinstance(other, Production):
@@ -77,6 +89,9 @@ class Rule(object):
         self.name = name
         self.productions = list(productions)
 
+        self.first = set()
+        self.nullable = False
+
     def __str__(self):
         return self.name
 
@@ -88,6 +103,57 @@ class Rule(object):
     def add(self, *productions):
         self.productions.extend(productions)
 
+# A terminal of several words, such as "how many" in "NPWH/CNT -> how many".
+# It is scanned word by word, keeping a partial scan in the columns between
+# its first and last word instead of chart states (see scan_column()). It
+# prints as the words it consists of.
+class Phrase(str):
+    def __new__(cls, words):
+        phrase = str.__new__(cls, " ".join(words))
+        phrase.words = tuple(words)
+        return phrase
+
+def first_word(term):
+    return term.words[0] if isinstance(term, Phrase) else term
+
+# A term standing for every word of a category of an external lexicon (see
+# lexicon.py), so that the words need not be productions of the grammar. It
+# is scanned by looking the token up in the lexicon, which gives a completed
+# state for each entry of the category, with the production of the entry:
+#   N -> <N>   scans "pizza" as   N::Pizza -> pizza
+# Entries may have several words, as phrases do.
+class LexicalTerm(object):
+    def __init__(self, lexicon, category):
+        self.lexicon = lexicon
+        self.category = category
+
+    def __str__(self):
+        return "<%s>" % self.category
+
+    def __repr__(self):
+        return str(self)
+
+    def productions(self, words):
+        return self.lexicon.productions(words, self.category)
+
+    # Whether some entry of the category starts with the words (and has
+    # more of them).
+    def continues(self, words):
+        return self.lexicon.continues(words, self.category)
+
+    def matches(self, token):
+        return token is not None and (len(self.productions(token)) > 0 or self.continues(token))
+
+    # (width, production) of every entry matching the tokens from the
+    # position on.
+    def match(self, tokens, position):
+        for width in itertools.count(1):
+            words = " ".join(tokens[position:position + width])
+            for production in self.productions(words):
+                yield width, production
+            if position + width >= len(tokens) or not self.continues(words):
+                break
+
 # State is a 3-tuple of a dotted rule, start column and end column.
 # State also stores semantic expressions for every non-terminal in the right-hand side.
 class State(object):
@@ -117,14 +183,15 @@ class State(object):
         if not isinstance(other, State):
             return False
         return \
-            (self.name,  self.production,  self.semantics,  self.dot_index,  self.start_column) == \
-            (other.name, other.production, other.semantics, other.dot_index, other.start_column)
+            (self.name,  self.production,  self.dot_index,  self.start_column) == \
+            (other.name, other.production, other.dot_index, other.start_column) and \
+            map(force, self.semantics) == map(force, other.semantics)
 
     def __ne__(self, other):
         return not (self == other)
 
     def __hash__(self):
-        return hash((self.name, self.production))
+        return hash((self.name, self.production, self.dot_index, self.start_column))
 
     def is_completed(self):
         return self.dot_index >= len(self.production)
@@ -135,7 +202,7 @@ class State(object):
         return self.production[self.dot_index]
 
     def get_semantics(self):
-        return self.production.get_semantics(self.semantics)
+        return self.production.get_semantics(map(force, self.semantics))
 
 # Column is a list of states in a chart table.
 class Column(object):
@@ -146,6 +213,17 @@ class Column(object):
         self.states = []
         self._predecessors = {}
 
+        # Incomplete states grouped by the name of the rule they wait for.
+        self.waiting = {}
+        # Completed states which start and end in this column (that is,
+        # derivations of the empty string), grouped by rule name.
+        self.empty_completions = {}
+        # Leo items grouped by rule name; see leo_item().
+        self.leo = {}
+        # Scans of phrases and lexical entries which are not complete yet,
+        # as (state, term, words scanned so far).
+        self.partials = []
+
     def __str__(self):
         return str(self.index)
 
@@ -160,11 +238,16 @@ class Column(object):
 
     def add(self, state, predecessor = None):
         if state not in self._predecessors:
-            self._predecessors[state] = set()
+            self._predecessors[state] = []
             state.end_column = self
             self.states.append(state)
-        if predecessor is not None:
-            self._predecessors[state].add(predecessor)
+            term = state.get_next_term()
+            if isinstance(term, Rule):
+                self.waiting.setdefault(term.name, []).append(state)
+        # Predecessors are kept in the order they were found, so that ties
+        # between equally good derivations are broken the same way every time.
+        if predecessor is not None and predecessor not in self._predecessors[state]:
+            self._predecessors[state].append(predecessor)
 
     def dump(self, only_completed = False):
         print " [%s] %r" % (self.index, self.token)
@@ -179,6 +262,90 @@ class Column(object):
     def predecessors(self, state):
         return self._predecessors[state]
 
+# Leo item (J. Leo, 1991) for a rule X in a column: the only state of the
+# column waiting for X, provided X is the last term of its production, and,
+# recursively, the Leo item of the rule that state belongs to. Completing X
+# then deterministically completes every state up the chain, so only the
+# topmost one is added to the chart. This keeps right recursion linear.
+class LeoItem(object):
+    def __init__(self, state, parent):
+        self.state = state
+        self.parent = parent
+        self.top = parent.top if parent is not None else self
+
+        # The state below the top which is closest to it and whose semantics
+        # does not depend on its children; folding semantics starts there.
+        if parent is None:
+            self.reset = None
+        elif parent.reset is not None:
+            self.reset = parent.reset
+        elif isinstance(state.production.semantics, logic_ast_nodes.Empty):
+            self.reset = self
+        else:
+            self.reset = None
+
+    # Semantics of the completed state just below the top, given the
+    # completed state for the bottom of the chain.
+    def get_semantics(self, state):
+        if self.reset is not None:
+            semantics = self.reset.state.production.semantics
+            item = self.reset.parent
+        else:
+            semantics = state.get_semantics()
+            item = self
+        while item is not self.top:
+            semantics = item.state.production.get_semantics(item.state.semantics + [ semantics ])
+            item = item.parent
+        return semantics
+
+# Semantics of the completed state just below the top of a Leo item, folded
+# only when requested: the topmost state is often never used (for instance,
+# a GAMMA state outside of the last column).
+class LeoSemantics(object):
+    def __init__(self, item, state):
+        self.item = item
+        self.state = state
+        self.value = None
+
+    def force(self):
+        if self.value is None:
+            self.value = self.item.get_semantics(self.state)
+        return self.value
+
+def force(semantics):
+    if isinstance(semantics, LeoSemantics):
+        return semantics.force()
+    return semantics
+
+# Completed state skipped by a Leo item, rebuilt on demand for parse trees.
+class LeoChild(object):
+    def __init__(self, item, child):
+        self.item = item
+        self.child = child
+
+        self.state = None
+
+    def materialize(self):
+        if self.state is None:
+            self.state = self._materialize()
+        return self.state
+
+    def _materialize(self):
+        state = self.child
+        item = self.item
+        while item is not item.top:
+            completed = State(
+                item.state.name,
+                item.state.production,
+                item.state.semantics + [ state.get_semantics() ],
+                item.state.dot_index + 1,
+                item.state.start_column,
+                self.child.end_column)
+            completed.leo_predecessors = [ (item.state, state) ]
+            state = completed
+            item = item.parent
+        return state
+
 class Node(object):
     def __init__(self, value, children):
         self.value = value
@@ -192,8 +359,15 @@ class Node(object):
 # INTERNAL SUBROUTINES FOR EARLEY ALGORITHM
 ################################################################################
 
-def predict(column, rule):
+# Lookahead value which disables FIRST set filtering in predict().
+ANY = object()
+
+def predict(column, rule, lookahead = ANY):
     for production in rule.productions:
+        if lookahead is not ANY and production.first is not None and \
+            not production.nullable and lookahead not in production.first and \
+            not any(term.matches(lookahead) for term in production.lexical_first):
+            continue
         column.add(
             State(
                 rule.name,
@@ -213,71 +387,476 @@ def scan(column, state, token):
             state.dot_index + 1,
             state.start_column), (state, None))
 
-def complete(column, state):
+def scan_phrase(column, state, term, words):
+    if term.words[len(words) - 1] != words[-1]:
+        return
+    if len(words) < len(term.words):
+        column.partials.append((state, term, words))
+        return
+    column.add(
+        State(
+            state.name,
+            state.production,
+            state.semantics + [ None ],
+            state.dot_index + 1,
+            state.start_column), (state, None))
+
+def scan_lexical(column, state, term, words):
+    phrase = " ".join(words)
+    for production in term.productions(phrase):
+        column.add(
+            State(
+                state.name,
+                production,
+                state.semantics + [ None ],
+                state.dot_index + 1,
+                state.start_column), (state, None))
+    if term.continues(phrase):
+        column.partials.append((state, term, words))
+
+def advance(column, prev_state, state):
+    column.add(
+        State(
+            prev_state.name,
+            prev_state.production,
+            prev_state.semantics + [ state.get_semantics() ],
+            prev_state.dot_index + 1,
+            prev_state.start_column), (prev_state, state))
+
+def complete(column, state, leo = False):
     if not state.is_completed():
         return
-    for prev_state in state.start_column:
-        term = prev_state.get_next_term()
-        if not isinstance(term, Rule):
-            continue
-        if term.name == state.name:
-            column.add(
-                State(
-                    prev_state.name,
-                    prev_state.production,
-                    prev_state.semantics + [ state.get_semantics() ],
-                    prev_state.dot_index + 1,
-                    prev_state.start_column), (prev_state, state))
+    if state.start_column is column:
+        column.empty_completions.setdefault(state.name, []).append(state)
+    elif leo:
+        item = state.start_column.leo.get(state.name)
+        if item is not None:
+            if item.top is item:
+                advance(column, item.state, state)
+            else:
+                top = item.top.state
+                column.add(
+                    State(
+                        top.name,
+                        top.production,
+                        top.semantics + [ LeoSemantics(item, state) ],
+                        top.dot_index + 1,
+                        top.start_column), (top, LeoChild(item, state)))
+            return
+    for prev_state in state.start_column.waiting.get(state.name, ()):
+        advance(column, prev_state, state)
+
+def leo_item(column, name):
+    if name in column.leo:
+        return column.leo[name]
+    column.leo[name] = None # Guards against cycles of unit productions.
+    waiting = column.waiting.get(name, ())
+    if len(waiting) == 1 and waiting[0].dot_index == len(waiting[0].production) - 1:
+        state = waiting[0]
+        column.leo[name] = LeoItem(state, leo_item(state.start_column, state.name))
+    return column.leo[name]
+
+# Called once the column is closed, so that every earlier column already
+# has all of its Leo items when a chain is extended.
+def compute_leo_items(column):
+    for name in column.waiting:
+        leo_item(column, name)
+
+# A state waiting for a nullable rule is advanced over the empty derivations
+# of that rule found so far; the ones found later reach it via complete().
+def complete_nullable(column, state, rule):
+    for empty_state in column.empty_completions.get(rule.name, ()):
+        advance(column, state, empty_state)
 
 GAMMA_RULE = "GAMMA"
 
-# ENTRY POINT FOR EARLEY ALGORITHM
-################################################################################
-def parse(starting_rule, text):
-    text_with_indexes = enumerate([ None ] + text.lower().split())
+def tokenize(text):
+    return text.lower().split()
+
+# Tokenizes text which arrives in chunks (lines of a log, reads from a
+# socket), joining words split across chunk boundaries.
+def itokenize(chunks):
+    tail = ""
+    for chunk in chunks:
+        words = (tail + chunk).lower().split()
+        if words and not chunk[-1:].isspace():
+            tail = words.pop()
+        else:
+            tail = ""
+        for word in words:
+            yield word
+    if tail:
+        yield tail
+
+# The chart built so far is kept in the error for recover().
+class ParseError(RuntimeError):
+    def __init__(self, position, token, table = None):
+        if token is None:
+            message = "Unexpected end of input after {0} tokens".format(position)
+        else:
+            message = "Unexpected token '{0}' at position {1}".format(token, position)
+        RuntimeError.__init__(self, message)
+        self.position = position
+        self.token = token
+        self.table = table
 
-    table = [ Column(i, token) for i, token in text_with_indexes ]
-    table[0].add(State(
+def start_column(starting_rule):
+    column = Column(0, None)
+    column.add(State(
         GAMMA_RULE,
         Production(logic.parse_logic_expression("S"), (starting_rule, "S")),
         [],
         0,
-        table[0]))
-
-    for i, column in enumerate(table):
-        for state in column:
-            if state.is_completed():
-                complete(column, state)
+        column))
+    return column
+
+# Builds the next column from the states of a closed column which expect
+# the given token, and from the partial scans of phrases the token goes on.
+def scan_column(column, token):
+    next_column = Column(column.index + 1, token)
+    for state in column:
+        if not state.is_completed():
+            term = state.get_next_term()
+            if isinstance(term, Rule):
+                continue
+            if isinstance(term, LexicalTerm):
+                scan_lexical(next_column, state, term, (token,))
+            elif isinstance(term, Phrase):
+                scan_phrase(next_column, state, term, (token,))
             else:
-                term = state.get_next_term()
-                if isinstance(term, Rule):
-                    predict(column, term)
-                elif i + 1 < len(table):
-                    scan(table[i + 1], state, term)
-        
-        # XXX(sandello): You can uncomment this line to see full dump of
-        # the chart table.
-        #
-        # column.dump(only_completed = False)
+                scan(next_column, state, term)
+    for state, term, words in column.partials:
+        if isinstance(term, LexicalTerm):
+            scan_lexical(next_column, state, term, words + (token,))
+        else:
+            scan_phrase(next_column, state, term, words + (token,))
+    return next_column
+
+# Runs predictions and completions in the column until no new states appear.
+# Predictions are filtered by the lookahead (the token of the next column,
+# None at the end of input or ANY when it is not known yet). Returns the
+# number of predictions and completions made.
+def close_column(column, lookahead = ANY, leo = True):
+    predictions = 0
+    completions = 0
+    for state in column:
+        if state.is_completed():
+            complete(column, state, leo)
+            completions += 1
+        else:
+            term = state.get_next_term()
+            if isinstance(term, Rule):
+                predict(column, term, lookahead)
+                if term.nullable:
+                    complete_nullable(column, state, term)
+                predictions += 1
+    if leo:
+        compute_leo_items(column)
+
+    # XXX(sandello): You can uncomment this line to see full dump of
+    # the chart table.
+    #
+    # column.dump(only_completed = False)
 
-    # Find Gamma rule in the last table column or fail otherwise.
-    result = []
+    return predictions, completions
+
+# Find Gamma rule in the last table column or fail otherwise.
+def iter_parses(table):
     for state in table[-1]:
         if state.name == GAMMA_RULE and state.is_completed():
-            result.extend(
-                (state.get_semantics(), tree) for tree in build_trees(state, table))
+            for tree in build_trees(state, table):
+                yield state, tree
+
+# Trees are enumerated lazily, so with max_trees only the requested ones are
+# built, and semantics are composed only for the states they belong to.
+def get_parses(table, max_trees = None):
+    semantics = {}
+    result = []
+    for state, tree in itertools.islice(iter_parses(table), max_trees):
+        if state not in semantics:
+            semantics[state] = state.get_semantics()
+        result.append((semantics[state], tree))
+    return result
+
+# ENTRY POINT FOR EARLEY ALGORITHM
+################################################################################
+def parse(starting_rule, text, profile = None, lookahead = True, leo = True, max_trees = None):
+    try:
+        return parse_stream(starting_rule, tokenize(text), profile, lookahead, leo, max_trees)
+    except ParseError:
+        return []
+
+# The first parse of the text (or None) and whether there are other ones.
+def parse_first(starting_rule, text, profile = None, lookahead = True, leo = True):
+    variants = parse(starting_rule, text, profile, lookahead, leo, max_trees = 2)
+    if len(variants) == 0:
+        return None, False
+    return variants[0], len(variants) > 1
+
+# Parses tokens as they are pulled from an iterator, keeping one token of
+# lookahead. Raises ParseError as soon as a token cannot be scanned, without
+# consuming the rest of the input, or when the input ends before a complete
+# question. With max_trees, at most that many parses are returned.
+def parse_stream(starting_rule, tokens, profile = None, lookahead = True, leo = True, max_trees = None):
+    if profile is None:
+        profile = profiling.NULL_PROFILE
+
+    table = parse_chart(starting_rule, tokens, profile, lookahead, leo)
+
+    with profile.stage("build_trees"):
+        result = get_parses(table, max_trees)
+    profile.count("trees", len(result))
+    if len(result) == 0:
+        raise ParseError(len(table) - 1, None, table)
     return result
 
+# Builds the chart for the tokens; raises ParseError on the first token
+# which cannot be scanned.
+def parse_chart(starting_rule, tokens, profile, lookahead = True, leo = True):
+    tokens = iter(tokens)
+    table = [ start_column(starting_rule) ]
+
+    predictions = 0
+    completions = 0
+
+    try:
+        with profile.stage("parse"):
+            token = next(tokens, None)
+            while True:
+                counts = close_column(table[-1], token if lookahead else ANY, leo)
+                predictions += counts[0]
+                completions += counts[1]
+                if token is None:
+                    break
+                column = scan_column(table[-1], token)
+                if len(column) == 0 and len(column.partials) == 0:
+                    raise ParseError(column.index - 1, token, table)
+                table.append(column)
+                token = next(tokens, None)
+    finally:
+        profile.count("states", sum(len(column) for column in table))
+        profile.count("predictions", predictions)
+        profile.count("completions", completions)
+
+    return table
+
+# The best scoring parse of the text (or None) and the number of parse trees,
+# without enumerating them.
+def parse_best(starting_rule, text, profile = None, lookahead = True, leo = True):
+    try:
+        return parse_best_stream(starting_rule, tokenize(text), profile, lookahead, leo)
+    except ParseError:
+        return None, 0
+
+def parse_best_stream(starting_rule, tokens, profile = None, lookahead = True, leo = True):
+    if profile is None:
+        profile = profiling.NULL_PROFILE
+
+    table = parse_chart(starting_rule, tokens, profile, lookahead, leo)
+
+    best = None
+    count = 0
+    with profile.stage("build_trees"):
+        derivations = Derivations(table)
+        for state in table[-1]:
+            if state.name == GAMMA_RULE and state.is_completed():
+                count += derivations.count(state)
+                if best is None or derivations.score(state) > derivations.score(best):
+                    best = state
+        if best is not None:
+            variant = (best.get_semantics(), derivations.best_tree(best))
+    profile.count("trees", count)
+    if best is None:
+        raise ParseError(len(table) - 1, None, table)
+    return variant, count
+
+# RECOVERY FROM PARSE FAILURES
+################################################################################
+def get_rules(starting_rule):
+    rules = [ starting_rule ]
+    seen = set([ starting_rule.name ])
+    for rule in rules:
+        for production in rule.productions:
+            for term in production:
+                if isinstance(term, Rule) and term.name not in seen:
+                    seen.add(term.name)
+                    rules.append(term)
+    return rules
+
+# Continues a failed parse past the failure. Whenever no state can scan the
+# next token, the column is restarted by predicting every rule of the
+# grammar there, so that constituents which do not fit the question built so
+# far are still recognized. Leo items are not used past the failure since
+# restarted columns get new waiting states after their Leo items were
+# computed.
+def continue_chart(starting_rule, table, tokens, lookahead = True):
+    rules = get_rules(starting_rule)
+    table = list(table)
+    while len(table) <= len(tokens):
+        column = table[-1]
+        token = tokens[column.index]
+        next_column = scan_column(column, token)
+        if len(next_column) == 0 and len(next_column.partials) == 0:
+            for rule in rules:
+                predict(column, rule, token if lookahead else ANY)
+            close_column(column, token if lookahead else ANY, leo = False)
+            next_column = scan_column(column, token)
+        table.append(next_column)
+        if next_column.index < len(tokens):
+            close_column(next_column, tokens[next_column.index] if lookahead else ANY, leo = False)
+        else:
+            close_column(next_column, None if lookahead else ANY, leo = False)
+    return table
+
+# Covers the input with completed constituents found in the chart, skipping
+# as few tokens as possible and, among such covers, using the fewest
+# constituents: a shortest path over columns where a completed state is an
+# edge from its start column to its end column and a skipped token is an
+# edge to the next column. Of constituents with the same span a sentence of
+# the starting rule is taken, otherwise the one completed last, that is the
+# outermost. Returns (start, end, tree) triples, with None for the tree of a
+# skipped token.
+def cover(table, starting_rule = None):
+    best = [ (0, 0, 0, None) ]
+    for column in table[1:]:
+        skipped, chunks, other, back = best[column.index - 1]
+        candidate = (skipped + 1, chunks, 2, (column.index - 1, None))
+        for state in column:
+            if state.is_completed() and state.name != GAMMA_RULE and state.start_column is not column:
+                skipped, chunks, other, back = best[state.start_column.index]
+                other = 0 if starting_rule is not None and state.name == starting_rule.name else 1
+                if (skipped, chunks + 1, other) <= candidate[:3]:
+                    candidate = (skipped, chunks + 1, other, (state.start_column.index, state))
+        best.append(candidate)
+
+    derivations = Derivations(table)
+    result = []
+    end = len(table) - 1
+    while end > 0:
+        start, state = best[end][3]
+        result.append((start, end, derivations.best_tree(state) if state is not None else None))
+        end = start
+    return list(reversed(result))
+
+# Chunks of an unparseable question which were understood, from the chart
+# kept in the ParseError of a failed parse of the tokens.
+def recover(starting_rule, error, tokens, profile = None, lookahead = True):
+    if profile is None:
+        profile = profiling.NULL_PROFILE
+
+    with profile.stage("recover"):
+        table = continue_chart(starting_rule, error.table, tokens, lookahead)
+        result = cover(table, starting_rule)
+    profile.count("chunks", sum(1 for start, end, tree in result if tree is not None))
+    return result
+
+# Incremental parsing of a question which is being typed.
+#
+# The session keeps the chart for the tokens seen so far. Columns are closed
+# with the lookahead of the following token, so the last column can only be
+# closed when the next token arrives; until then it is built on demand with
+# no lookahead filtering to answer what may come next or whether the prefix
+# is already a complete question. Editing the text keeps the columns of the
+# common prefix and recomputes the rest. The text is split into tokens by
+# the given function (such as normalization.Normalizer.tokenize).
+class ParseSession(object):
+    def __init__(self, starting_rule, lookahead = True, leo = True, tokenize = tokenize):
+        self.starting_rule = starting_rule
+        self.lookahead = lookahead
+        self.leo = leo
+        self.tokenize = tokenize
+        self.tokens = []
+        self.table = []
+        self.last = None
+        self.reused = 0
+
+    def _next_column(self):
+        if len(self.table) == 0:
+            return start_column(self.starting_rule)
+        return scan_column(self.table[-1], self.tokens[-1])
+
+    def feed(self, token):
+        column = self._next_column()
+        close_column(column, token if self.lookahead else ANY, self.leo)
+        self.table.append(column)
+        self.tokens.append(token)
+        self.last = None
+
+    def truncate(self, length):
+        if length < len(self.tokens):
+            del self.tokens[length:]
+            del self.table[length:]
+            self.last = None
+
+    # Moves the session to the given text, reusing the columns of the longest
+    # common prefix of tokens. Returns the number of reused columns.
+    def update(self, text):
+        tokens = self.tokenize(text)
+        common = 0
+        for old, new in itertools.izip(self.tokens, tokens):
+            if old != new:
+                break
+            common += 1
+        self.truncate(common)
+        for token in tokens[common:]:
+            self.feed(token)
+        self.reused = common
+        return common
+
+    def last_column(self):
+        if self.last is None:
+            self.last = self._next_column()
+            close_column(self.last, ANY, self.leo)
+        return self.last
+
+    # Words which may follow the current prefix. Words of an external
+    # lexicon are not listed; see expected_categories().
+    def expected(self):
+        column = self.last_column()
+        expected = set()
+        for state in column:
+            if not state.is_completed():
+                term = state.get_next_term()
+                if not isinstance(term, (Rule, LexicalTerm)):
+                    expected.add(first_word(term))
+        for state, term, words in column.partials:
+            if isinstance(term, Phrase):
+                expected.add(term.words[len(words)])
+        return expected
+
+    # Lexicon categories whose words may follow the current prefix.
+    def expected_categories(self):
+        column = self.last_column()
+        expected = set()
+        for state in column:
+            if isinstance(state.get_next_term(), LexicalTerm):
+                expected.add(state.get_next_term().category)
+        for state, term, words in column.partials:
+            if isinstance(term, LexicalTerm):
+                expected.add(term.category)
+        return expected
+
+    # Parses of the current prefix as a complete question.
+    def parses(self, max_trees = None):
+        return get_parses(self.table + [ self.last_column() ], max_trees)
+
 # AUXILIARY ROUTINES
 ################################################################################
 def build_trees(state, table):
     for children in build_children(state, table, []):
         yield Node(state, [c for c in reversed(children)])
 
+def get_predecessors(state, table):
+    if hasattr(state, "leo_predecessors"):
+        return state.leo_predecessors
+    return table[state.end_column.index].predecessors(state)
+
 def build_children(state, table, prev_children):
     has_predecessor = False
-    for predecessor, child in table[state.end_column.index].predecessors(state):
+    for predecessor, child in get_predecessors(state, table):
         has_predecessor = True
+        if isinstance(child, LeoChild):
+            child = child.materialize()
         if child is not None:
             for tree in build_trees(child, table):
                 prev_children.append(tree)
@@ -290,6 +869,58 @@ def build_children(state, table, prev_children):
     if not has_predecessor:
         yield prev_children
 
+# Viterbi-style selection of the best derivation, in one pass over the chart
+# instead of enumerating trees. For every state computes the best score of
+# its derivations, the number of derivations and the (predecessor, child)
+# pair the best one goes through.
+class Derivations(object):
+    def __init__(self, table):
+        self.table = table
+        self.memo = {}
+
+    def get(self, state):
+        # States are equal regardless of the column they end in.
+        key = (state, state.end_column)
+        if key in self.memo:
+            return self.memo[key]
+        self.memo[key] = (0.0, 0, None) # Guards against cycles of unit productions.
+
+        if state.dot_index == 0:
+            result = (state.production.weight, 1, None)
+        else:
+            result = (0.0, 0, None)
+            for predecessor, child in get_predecessors(state, self.table):
+                if isinstance(child, LeoChild):
+                    child = child.materialize()
+                score, count, best = self.get(predecessor)
+                if child is not None:
+                    child_score, child_count, child_best = self.get(child)
+                    score *= child_score
+                    count *= child_count
+                if result[2] is None or score > result[0]:
+                    result = (score, result[1] + count, (predecessor, child))
+                else:
+                    result = (result[0], result[1] + count, result[2])
+
+        self.memo[key] = result
+        return result
+
+    def score(self, state):
+        return self.get(state)[0]
+
+    def count(self, state):
+        return self.get(state)[1]
+
+    def best_tree(self, state):
+        children = []
+        current = state
+        while current.dot_index > 0:
+            predecessor, child = self.get(current)[2]
+            if child is not None:
+                children.append(self.best_tree(child))
+            current = predecessor
+        return Node(state, [c for c in reversed(children)])
+
 def qtree(node):
     # http://yohasebe.com/rsyntaxtree/
     if node.value.name == GAMMA_RULE:
@@ -312,51 +943,133 @@ def qtree(node):
         else:
             parts.append(term)
 
-    return "[{0} {1}]".format(node.value.name, " ".join(parts))
+    return "[{0}]".format(" ".join([ node.value.name ] + parts))
 
 ################################################################################
 
-def load_grammar(iterable):
-    RE_TERMINAL = r"^[a-z]+$"
-    RE_NON_TERMINAL = r"^[A-Z_/\\]+$"
-
-    non_terminals = dict()
+def compute_first_sets(rules):
+    for rule in rules:
+        rule.first = set()
+        rule.nullable = False
+
+    def first_of(production):
+        first = set()
+        for term in production:
+            if not isinstance(term, Rule):
+                first.add(first_word(term))
+                return first, False
+            first |= term.first
+            if not term.nullable:
+                return first, False
+        return first, True
+
+    # Productions starting with a terminal (most of the lexicon) contribute
+    # the same in every round, so only the rest is iterated to a fixpoint.
+    pending = []
+    for rule in rules:
+        for production in rule.productions:
+            if len(production) > 0 and not isinstance(production[0], Rule):
+                rule.first.add(first_word(production[0]))
+                production.first = frozenset([ first_word(production[0]) ])
+                production.nullable = False
+                production.lexical_first = (production[0],) if isinstance(production[0], LexicalTerm) else ()
+            else:
+                pending.append((rule, production))
+
+    changed = True
+    while changed:
+        changed = False
+        for rule, production in pending:
+            first, nullable = first_of(production)
+            if not first <= rule.first:
+                rule.first |= first
+                changed = True
+            if nullable and not rule.nullable:
+                rule.nullable = True
+                changed = True
+
+    for rule, production in pending:
+        first, nullable = first_of(production)
+        production.first = frozenset(first)
+        production.nullable = nullable
+        production.lexical_first = tuple(term for term in first if isinstance(term, LexicalTerm))
+
+TERMINAL_CHARACTERS = string.ascii_lowercase
+NON_TERMINAL_CHARACTERS = string.ascii_uppercase + "_/\\"
+
+def is_terminal(name):
+    return len(name) > 0 and len(name.strip(TERMINAL_CHARACTERS)) == 0
+
+def is_non_terminal(name):
+    return len(name) > 0 and len(name.strip(NON_TERMINAL_CHARACTERS)) == 0
+
+def is_weight(part):
+    number = part[1:]
+    return part[0] == "@" and len(number) > 0 and len(number.strip(string.digits + ".")) == 0 and \
+        number.count(".") <= 1 and number[-1] != "."
+
+# A production may end with a weight, as in "NP -> NP:=A AND NP:=A @0.5";
+# productions without one weigh 1. Productions of several terminals only,
+# as "NPWH/CNT -> how many", have a single Phrase term.
+#
+# If a dictionary of rules is given, it is filled with all non-terminals of
+# the grammar by name, including the ones not reachable from the starting
+# rule.
+#
+# Every line is scanned once: terms are told apart by the characters they
+# consist of, and every distinct semantic expression is parsed only once
+# (lexical lines repeat the same ones a lot).
+def load_grammar(iterable, rules = None):
+    non_terminals = dict() if rules is None else rules
     starting_rule = None
 
-    def get_term_and_semantics(n, part):
-        if part.find(":") > 0:
-            part, semantics = part.split(":", 1)
-            if len(semantics) == 0 or semantics[0] not in [ ":", "=" ]:
-                raise RuntimeError, "Malformed line #{0}: Invalid semantic expression for term '{1}'".format(n + 1, part)
-            if semantics[0] == ":":
-                try:
-                    semantics = logic.parse_logic_expression(semantics[1:])
-                except:
-                    raise RuntimeError, "Malformed line #{0}: Unable to parse semantic expression for term '{1}'".format(n + 1, part)
-            elif semantics[0] == "=":
-                semantics = semantics[1:]
-        else:
-            semantics = logic_ast_nodes.Empty()
-        if re.match(RE_TERMINAL, part):
-            return part, semantics
-        if re.match(RE_NON_TERMINAL, part):
-            if part not in non_terminals:
-                non_terminals[part] = Rule(part)
-            return non_terminals[part], semantics
-        raise RuntimeError, "(unreachable)"
+    empty = logic_ast_nodes.Empty()
+    expressions = {}
+
+    def get_semantics(n, name, annotation):
+        if annotation is None:
+            return empty
+        if len(annotation) == 0 or annotation[0] not in ":=":
+            raise RuntimeError, "Malformed line #{0}: Invalid semantic expression for term '{1}'".format(n + 1, name)
+        if annotation[0] == "=":
+            return annotation[1:]
+        expression = annotation[1:]
+        if expression not in expressions:
+            try:
+                expressions[expression] = logic.parse_logic_expression(expression)
+            except:
+                raise RuntimeError, "Malformed line #{0}: Unable to parse semantic expression for term '{1}'".format(n + 1, name)
+        return expressions[expression]
+
+    def get_term(name):
+        if name == "->" or name == "!->":
+            raise RuntimeError, "(unreachable)"
+        if name[0] in TERMINAL_CHARACTERS:
+            return name
+        if name not in non_terminals:
+            non_terminals[name] = Rule(name)
+        return non_terminals[name]
 
     for n, line in enumerate(iterable):
-        parts = line.strip().split()
-
-        for part in parts:
-            if part.find(":") > 0:
-                part = part.split(":")[0]
-            if not re.match(RE_TERMINAL, part) and not re.match(RE_NON_TERMINAL, part) and not part == "->" and not part == "!->":
-                raise RuntimeError, "Malformed line #{0}: Unable to determine whether term '{1}' is a terminal or a non-terminal".format(n + 1, part)
-
+        parts = line.split()
         if len(parts) == 0:
             continue
 
+        weight = 1.0
+        if len(parts) > 2 and is_weight(parts[-1]):
+            weight = float(parts.pop()[1:])
+
+        terms = []
+        for part in parts:
+            colon = part.find(":")
+            if colon > 0:
+                name, annotation = part[:colon], part[colon + 1:]
+            else:
+                name, annotation = part, None
+            if not is_terminal(name) and not is_non_terminal(name) and not part == "->" and not part == "!->":
+                raise RuntimeError, "Malformed line #{0}: Unable to determine whether term '{1}' is a terminal or a non-terminal".format(n + 1, name)
+            terms.append((name, annotation))
+
         if len(parts) == 1:
             if parts[0] not in non_terminals:
                 raise RuntimeError, "Malformed line #{0}: Unknown non-terminal '{1}'".format(n + 1, parts[0])
@@ -367,23 +1080,27 @@ def load_grammar(iterable):
         if parts[1] != "->" and parts[1] != "!->":
             raise RuntimeError, "Malformed line #{0}: Second part should be either '->' or '!->'".format(n + 1)
 
-        if parts[1] == "->":
-            safe_bindings = True
-        else:
-            safe_bindings = False
+        safe_bindings = parts[1] == "->"
 
-        lhs = get_term_and_semantics(n, parts[0])
-        rhs = map(lambda x: get_term_and_semantics(n, x), parts[2:])
+        lhs = (get_term(terms[0][0]), get_semantics(n, *terms[0]))
+        rhs = [ (get_term(name), get_semantics(n, name, annotation)) for name, annotation in terms[2:] ]
 
         if not isinstance(lhs[1], logic_ast_nodes.Node):
             raise RuntimeError, "Malformed line #{0}: Semantics for left-hand side should be either logic expression or nothing".format(n + 1)
-        if not all(map(lambda x: isinstance(x[1], str) or isinstance(x[1], logic_ast_nodes.Empty), rhs)):
-            raise RuntimeError, "Malformed line #{0}: Semantics for right-hand shide should be only variable bindings".format(n + 1)
+        for term, semantics in rhs:
+            if not isinstance(semantics, str) and semantics is not empty:
+                raise RuntimeError, "Malformed line #{0}: Semantics for right-hand shide should be only variable bindings".format(n + 1)
 
         if not isinstance(lhs[0], Rule):
             raise RuntimeError, "Malformed line #{0}: Left-hand side have to be a non-terminal".format(n + 1)
 
-        lhs[0].add(Production(lhs[1], *rhs, safe_bindings = safe_bindings))
+        # A lexical entry of several words is scanned as one phrase.
+        if len(rhs) > 1 and all(isinstance(term, str) and semantics is empty for term, semantics in rhs):
+            rhs = [ (Phrase([ term for term, semantics in rhs ]), empty) ]
+
+        lhs[0].add(Production(lhs[1], *rhs, safe_bindings = safe_bindings, weight = weight))
+
+    compute_first_sets(non_terminals.values())
 
     if starting_rule:
         return non_terminals[starting_rule]
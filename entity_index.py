@@ -0,0 +1,120 @@
+#!/usr/bin/python
+################################################################################
+# Entities of the knowledge base as words of the grammar.
+#
+# The index holds the distinct values of the relations (Pizza, Cheese, ...)
+# by their word (pizza, cheese, ...). It is attached to a grammar the way a
+# lexicon is (see lexicon.py), as a category whose words are the entities,
+# each with its value as semantics: N::Pasta -> pasta for a value Pasta.
+# Only words the grammar does not know otherwise, neither as terminals nor
+# from a lexicon, are taken from the index, so that the entities which are
+# already in the lexicon do not make every question mentioning them
+# ambiguous.
+#
+# Words are normalized as the tokens of questions are, if a normalizer is
+# given (see normalization.py).
+#
+# The index is loaded from the database once and then kept up to date by
+# adding the values of every INSERT, so the vocabulary grows with the
+# knowledge base without reloading the grammar.
+#
+# With a category for new words, a word which is neither known nor an entity
+# yet is a word of that category, standing for a new entity named after it
+# (N/NEW::Pasta -> pasta), so that a statement such as "pasta consists of
+# cheese" can introduce it. The grammar uses the category only where
+# statements name their subjects and objects; elsewhere such a word, a typo
+# for instance, still makes the sentence fail to parse.
+
+import earley
+import lexicon
+import logic
+import logic_ast_nodes
+import memo
+
+class EntityIndex(object):
+    def __init__(self, category = "N", normalizer = None, new_category = None):
+        self.category = category
+        self.normalizer = normalizer
+        self.new_category = new_category
+        self.categories = [ category ] if new_category is None else [ category, new_category ]
+        self.empty = logic_ast_nodes.Empty()
+
+        self.entities = {}
+        self.cache = memo.Memo(self._make_productions)
+        self.terminals = set()
+        self.lexicons = []
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __contains__(self, word):
+        return word in self.entities
+
+    # Values which are not symbols (numbers, text with spaces) cannot be
+    # words and are skipped.
+    def add(self, value):
+        if not isinstance(value, basestring) or not logic.is_symbol(value):
+            return
+        word = str(value).lower()
+        if self.normalizer is not None:
+            word = self.normalizer.normalize_word(word)
+        if self.entities.get(word) != value:
+            self.entities[word] = str(value)
+            self.cache.forget(word)
+
+    def clear(self):
+        self.entities.clear()
+        self.cache.clear()
+
+    # Adds the distinct values of every text argument of the predicates
+    # (see schema.py) whose tables exist in the database.
+    def load(self, pool, predicates):
+        for predicate in predicates:
+            columns = pool.columns(predicate.table)
+            for n, type in enumerate(predicate.columns):
+                if type == "TEXT" and predicate.column(n) in columns:
+                    for row in pool.read("SELECT DISTINCT {0} FROM {1}".format(predicate.column(n), predicate.table)):
+                        self.add(row[0])
+
+    def is_known(self, word):
+        return word in self.terminals or any(len(known.lookup(word)) > 0 for known in self.lexicons)
+
+    def productions(self, word, category):
+        if category == self.category:
+            return self.cache(word)[0]
+        if category == self.new_category:
+            return self.cache(word)[1]
+        return ()
+
+    # Productions of the word as an entity and as a new word.
+    def _make_productions(self, word):
+        if self.is_known(word):
+            return (), ()
+        if word in self.entities:
+            return self._make_production(word, self.entities[word]), ()
+        if self.new_category is not None and logic.is_symbol(word.capitalize()):
+            return (), self._make_production(word, word.capitalize())
+        return (), ()
+
+    def _make_production(self, word, value):
+        return (earley.Production(logic.parse_logic_expression(value), (word, self.empty)),)
+
+    # Entities are single words.
+    def continues(self, words, category = None):
+        return False
+
+    # Attaches the index to the grammar after its lexicons, if any; words
+    # they or the grammar know are not looked up in the index.
+    def attach(self, starting_rule):
+        for rule in earley.get_rules(starting_rule):
+            for production in rule.productions:
+                for term in production:
+                    if isinstance(term, earley.LexicalTerm):
+                        if term.lexicon is not self and term.lexicon not in self.lexicons:
+                            self.lexicons.append(term.lexicon)
+                    elif isinstance(term, earley.Phrase):
+                        self.terminals.update(term.words)
+                    elif not isinstance(term, earley.Rule):
+                        self.terminals.add(term)
+        self.cache.clear()
+        return lexicon.attach(self, starting_rule)
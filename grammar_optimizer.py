@@ -0,0 +1,168 @@
+#!/usr/bin/python
+################################################################################
+# Load-time optimization pass over a grammar loaded by earley.load_grammar.
+#
+#   * Rules which cannot derive any string of terminals (unproductive) are
+#     removed together with the productions using them.
+#   * Rules which cannot be reached from the starting rule are removed.
+#   * Unit productions (A -> B) are replaced by the productions of B, with
+#     the semantics of A composed with the semantics of B at load time
+#     (unless B has words of an external lexicon).
+#   * Identical productions of a rule are merged into one.
+#
+# The result is a new grammar; the one given is left untouched. Semantics of
+# parses are unchanged. Parse trees differ where unit productions were
+# collapsed, and duplicate productions no longer count as ambiguity.
+#
+# Usage: python grammar_optimizer.py [repl.txt [repl.lex]]   (prints what was changed)
+
+import sys
+
+import earley
+
+def is_unit(production):
+    return len(production) == 1 and isinstance(production[0], earley.Rule)
+
+# The semantics of a word of a lexicon is known only once it is scanned, so
+# unit productions of rules with lexical terms are not collapsed.
+def is_lexical(production):
+    return any(isinstance(term, earley.LexicalTerm) for term in production)
+
+def get_productive(rules):
+    productive = set()
+    changed = True
+    while changed:
+        changed = False
+        for rule in rules:
+            if rule.name in productive:
+                continue
+            for production in rule.productions:
+                if all(term.name in productive for term in production if isinstance(term, earley.Rule)):
+                    productive.add(rule.name)
+                    changed = True
+                    break
+    return productive
+
+# Semantics of A -> B:=X composed with B -> ... at load time. The variables
+# bound on the right-hand side of B stay free until the composed production
+# is parsed. Returns None when the composition might capture differently
+# from composing at parse time.
+def compose(outer, inner):
+    if outer.safe_bindings != inner.safe_bindings:
+        return None
+    variable = outer.terms[0][1]
+    if not isinstance(variable, str):
+        # A -> B without a binding does not use the semantics of B.
+        semantics = outer.semantics
+    else:
+        names = set(v for t, v in inner.terms if isinstance(v, str))
+        if (outer.semantics.free_variables() - set([ variable ])) & names:
+            return None
+        semantics = outer.semantics.replace_with_bindings({ variable: inner.semantics }, outer.safe_bindings)
+    return earley.Production(
+        semantics,
+        *inner.terms,
+        safe_bindings = inner.safe_bindings,
+        weight = outer.weight * inner.weight)
+
+def collapse(rule, production, report, chain):
+    target = production[0]
+    if target.name in chain or any(is_lexical(inner) for inner in target.productions):
+        return [ production ]
+    result = []
+    for inner in target.productions:
+        composed = compose(production, inner)
+        if composed is None:
+            return [ production ]
+        if is_unit(composed):
+            result.extend(collapse(rule, composed, report, chain | set([ target.name ])))
+        else:
+            result.append(composed)
+    report.append("collapsed unit production %s -> %r into %d productions" % (rule.name, production, len(result)))
+    return result
+
+def merge_duplicates(rule, report):
+    productions = []
+    for production in rule.productions:
+        if production in productions:
+            duplicate = productions[productions.index(production)]
+            duplicate.weight = max(duplicate.weight, production.weight)
+            report.append("merged duplicate production %s -> %r" % (rule.name, production))
+        else:
+            productions.append(production)
+    rule.productions = productions
+
+def optimize(starting_rule, rules = None):
+    report = []
+    if rules is None:
+        rules = earley.get_rules(starting_rule)
+
+    productive = get_productive(rules)
+    for rule in rules:
+        if rule.name not in productive:
+            report.append("removed unproductive rule %s" % rule.name)
+    if starting_rule.name not in productive:
+        raise RuntimeError, "Starting rule '{0}' does not derive any sentence".format(starting_rule.name)
+
+    # Copies of the productive rules, with productions using unproductive
+    # rules dropped.
+    copies = dict((rule.name, earley.Rule(rule.name)) for rule in rules if rule.name in productive)
+    for rule in rules:
+        if rule.name not in productive:
+            continue
+        for production in rule.productions:
+            if any(isinstance(term, earley.Rule) and term.name not in productive for term in production):
+                report.append("removed production %s -> %r using an unproductive rule" % (rule.name, production))
+                continue
+            terms = [ (copies[term.name] if isinstance(term, earley.Rule) else term, variable)
+                for term, variable in production.terms ]
+            copies[rule.name].add(earley.Production(
+                production.semantics,
+                *terms,
+                safe_bindings = production.safe_bindings,
+                weight = production.weight))
+
+    # Duplicates are merged before collapsing unit productions, so that they
+    # are not collapsed twice, and after, since collapsing may produce more.
+    for rule in copies.itervalues():
+        merge_duplicates(rule, report)
+    for rule in copies.itervalues():
+        productions = []
+        for production in rule.productions:
+            if is_unit(production):
+                productions.extend(collapse(rule, production, report, set([ rule.name ])))
+            else:
+                productions.append(production)
+        rule.productions = productions
+    for rule in copies.itervalues():
+        merge_duplicates(rule, report)
+
+    result = copies[starting_rule.name]
+    reachable = earley.get_rules(result)
+    names = set(rule.name for rule in reachable)
+    for name in sorted(copies):
+        if name not in names:
+            report.append("removed unreachable rule %s" % name)
+
+    earley.compute_first_sets(reachable)
+    return result, report
+
+if __name__ == "__main__":
+    import repl
+    import lexicon
+
+    grammar = sys.argv[1] if len(sys.argv) > 1 else "repl.txt"
+    lexicon_path = sys.argv[2] if len(sys.argv) > 2 else "repl.lex"
+    rules = {}
+    starting_rule = earley.load_grammar(repl.filter_comments(open(grammar, "r").readlines()), rules)
+    lexicon.attach(lexicon.Lexicon(lexicon_path), starting_rule)
+    before = sum(len(rule.productions) for rule in rules.itervalues())
+
+    optimized, report = optimize(starting_rule, rules.values())
+    after = earley.get_rules(optimized)
+
+    for line in report:
+        print line
+    print
+    print "rules: %d -> %d, productions: %d -> %d" % (
+        len(rules), len(after), before, sum(len(rule.productions) for rule in after))
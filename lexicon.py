@@ -0,0 +1,182 @@
+#!/usr/bin/python
+################################################################################
+# Lexicon kept outside the grammar, in a file of lexical entries sorted by
+# word, one per line:
+#
+#   #lexicon<TAB>N<TAB>V/TRANS
+#   caesar salad<TAB>N<TAB>Caesarsalad
+#   cheese<TAB>N<TAB>Cheese
+#   dishes<TAB>N<TAB>
+#   pizza<TAB>N<TAB>Pizza
+#
+# The first line lists the categories of the entries; the semantics of an
+# entry may be empty. The file is memory-mapped and words are looked up by
+# binary search over it, so opening a lexicon takes the same time whatever
+# its size and only the entries of words which were actually seen become
+# Python objects.
+#
+# An entry may have several words. Since entries are sorted, the ones
+# starting with the same words are next to each other and the file serves as
+# a trie: the same binary search which finds the entries of "caesar" tells
+# whether some entry goes on with "caesar ...", so the parser knows whether
+# to keep scanning.
+#
+# A lexicon is attached to a grammar with attach(): every rule named after
+# a category of the lexicon gets a production with a single
+# earley.LexicalTerm, which scans any word of that category.
+#
+# Usage: python lexicon.py entries.tsv repl.lex   (sorts entries into a lexicon)
+
+import sys
+import mmap
+
+import earley
+import logic
+import logic_ast_nodes
+import memo
+
+HEADER = "#lexicon"
+
+class Lexicon(object):
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        header = self.data.readline().rstrip("\n").split("\t")
+        if header[0] != HEADER:
+            raise RuntimeError, "'{0}' is not a lexicon file".format(path)
+        self.categories = header[1:]
+        self.start = self.data.tell()
+
+        self.empty = logic_ast_nodes.Empty()
+        self.cache = memo.Memo(self._make_entry)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    # Offset of the first line whose word is not less than the given one.
+    def _find(self, word):
+        data = self.data
+        low, high = self.start, len(data)
+        while low < high:
+            middle = (low + high) // 2
+            begin = data.rfind("\n", self.start - 1, middle) + 1
+            if data[begin:data.find("\t", begin)] < word:
+                low = data.find("\n", begin) + 1
+            else:
+                high = begin
+        return low
+
+    # (category, semantics) of every entry of the words, as written in the
+    # file, and the offset of the first entry starting with them followed by
+    # more words, if any. Entries "words word..." come right after the
+    # entries of "words", since a tab sorts before a space.
+    def _scan(self, words):
+        data = self.data
+        entries = []
+        offset = self._find(words)
+        while offset < len(data):
+            end = data.find("\n", offset)
+            if end < 0:
+                end = len(data)
+            entry, category, semantics = data[offset:end].split("\t")
+            if entry != words:
+                return entries, offset if entry.startswith(words + " ") else None
+            entries.append((category, semantics))
+            offset = end + 1
+        return entries, None
+
+    # Whether an entry of the category, from the offset on, starts with the
+    # words followed by more words.
+    def _continues(self, words, offset, category):
+        data = self.data
+        prefix = words + " "
+        while offset < len(data):
+            end = data.find("\n", offset)
+            if end < 0:
+                end = len(data)
+            entry, entry_category, semantics = data[offset:end].split("\t")
+            if not entry.startswith(prefix):
+                return False
+            if entry_category == category:
+                return True
+            offset = end + 1
+        return False
+
+    def lookup(self, words):
+        return self._scan(words)[0]
+
+    # Productions of the entries of the words in every category, as they
+    # would be loaded from "CATEGORY::Semantics -> words", the offset of the
+    # entries going on with more words and, by category, whether some of
+    # them is of the category.
+    def _get(self, words):
+        return self.cache(words)
+
+    def _make_entry(self, words):
+        entries, offset = self._scan(words)
+        productions = {}
+        for category, semantics in entries:
+            productions.setdefault(category, []).append(earley.Production(
+                logic.parse_logic_expression(semantics) if semantics else self.empty,
+                (words, self.empty)))
+        return productions, offset, {}
+
+    def productions(self, words, category):
+        return self._get(words)[0].get(category, ())
+
+    # Whether some entry, of the category if one is given, goes on with more
+    # words.
+    def continues(self, words, category = None):
+        productions, offset, continuations = self._get(words)
+        if offset is None:
+            return False
+        if category is None:
+            return True
+        if category not in continuations:
+            continuations[category] = self._continues(words, offset, category)
+        return continuations[category]
+
+# Makes the rules of the grammar named after categories of the lexicon scan
+# its words. Returns the rules the lexicon was attached to.
+def attach(lexicon, starting_rule):
+    rules = earley.get_rules(starting_rule)
+    attached = []
+    for rule in rules:
+        if rule.name in lexicon.categories:
+            rule.add(earley.Production(lexicon.empty, (earley.LexicalTerm(lexicon, rule.name), lexicon.empty)))
+            attached.append(rule)
+    earley.compute_first_sets(rules)
+    return attached
+
+# Writes (words, category, semantics) entries as a lexicon file; the words
+# are separated by single spaces.
+def write(path, entries):
+    entries = sorted(set(entries))
+    categories = sorted(set(category for word, category, semantics in entries))
+    with open(path, "wb") as output:
+        output.write("\t".join([ HEADER ] + categories) + "\n")
+        for word, category, semantics in entries:
+            if not all(earley.is_terminal(part) for part in word.split(" ")):
+                raise RuntimeError, "Invalid word '{0}' in lexicon".format(word)
+            if not earley.is_non_terminal(category):
+                raise RuntimeError, "Invalid category '{0}' for word '{1}' in lexicon".format(category, word)
+            if semantics:
+                try:
+                    logic.parse_logic_expression(semantics)
+                except:
+                    raise RuntimeError, "Unable to parse semantic expression for word '{0}' in lexicon".format(word)
+            output.write("\t".join([ word, category, semantics ]) + "\n")
+
+if __name__ == "__main__":
+    entries = []
+    for n, line in enumerate(open(sys.argv[1], "r")):
+        parts = line.rstrip("\n").split("\t")
+        if len(parts) == 1 and not parts[0].strip():
+            continue
+        if len(parts) != 3:
+            raise RuntimeError, "Malformed line #{0}: Expected word, category and semantics".format(n + 1)
+        entries.append(tuple(parts))
+    write(sys.argv[2], entries)
@@ -0,0 +1,94 @@
+#!/usr/bin/python
+################################################################################
+# Load generator for server.py.
+#
+# Replays a scenario from many simulated clients. The scenario is first sent
+# once by a single client so that statements are applied exactly once; the
+# questions it answered with a SELECT are then replayed concurrently by every
+# client and per-request latencies are reported.
+
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+
+import server
+
+class Client(object):
+    def __init__(self, tcp = None, unix = None):
+        if unix is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(unix)
+        else:
+            self.socket = socket.create_connection(tcp)
+        self.stream = self.socket.makefile("rw")
+        self.next_id = 0
+
+    def ask(self, question):
+        self.next_id += 1
+        self.stream.write(json.dumps({ "id": self.next_id, "question": question }) + "\n")
+        self.stream.flush()
+        return json.loads(self.stream.readline())
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+def replay(address, questions, repeat, latencies, errors):
+    client = Client(**address)
+    try:
+        for n in range(repeat):
+            for question in questions:
+                started = time.time()
+                response = client.ask(question)
+                latencies.append(time.time() - started)
+                if response["status"] != "ok":
+                    errors.append(response)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Replays a scenario against server.py.")
+    parser.add_argument("scenario", nargs = "?", default = "scenario.txt")
+    parser.add_argument("--tcp", type = server.parse_address, default = ("127.0.0.1", 7777), metavar = "HOST:PORT")
+    parser.add_argument("--unix", metavar = "PATH")
+    parser.add_argument("--clients", type = int, default = 16)
+    parser.add_argument("--repeat", type = int, default = 10)
+    args = parser.parse_args()
+
+    address = { "unix": args.unix } if args.unix else { "tcp": args.tcp }
+
+    lines = [ line.strip() for line in open(args.scenario, "r") ]
+    lines = [ line for line in lines if line and not line.startswith(".") ]
+
+    seed = Client(**address)
+    questions = [ line for line in lines if seed.ask(line).get("type") == "SELECT" ]
+    seed.close()
+
+    latencies = []
+    errors = []
+    threads = [
+        threading.Thread(target = replay, args = (address, questions, args.repeat, latencies, errors))
+        for n in range(args.clients) ]
+
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    print "clients:    %d" % args.clients
+    print "requests:   %d (%d errors)" % (len(latencies), len(errors))
+    print "throughput: %.1f req/s" % (len(latencies) / elapsed)
+    print "p50:        %.2f ms" % (percentile(latencies, 50) * 1000)
+    print "p99:        %.2f ms" % (percentile(latencies, 99) * 1000)
+    sys.exit(1 if errors else 0)
@@ -159,7 +159,14 @@ if DEBUG:
     LambdaExpression.setDebug(True)
     ParenthesizedExpression.setDebug(True)
 
+def is_symbol(string):
+    return len(string) >= 2 and string[0] in UPPERCASE_LETTERS and len(string[1:].strip(LOWERCASE_LETTERS)) == 0
+
 def parse_logic_expression(string):
+    # Bare symbols make up most of the lexical entries of a grammar and do
+    # not need the full parser.
+    if is_symbol(string):
+        return nodes.Symbol(string)
     result = Expression.parseString(string, parseAll = True)
     assert(len(result) == 1)
     assert(True)#Check type
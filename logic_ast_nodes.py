@@ -2,6 +2,17 @@
 # AST Nodes
 
 import operator
+import threading
+
+# Beta reductions of the simplify() running in the current thread.
+_local = threading.local()
+
+# Simplifies the node; returns the result and the number of beta reductions
+# it took. Counted per thread, so concurrent callers do not see each other's.
+def simplify(node):
+    _local.reductions = 0
+    simplified = node.simplify()
+    return simplified, _local.reductions
 
 class Node(object):
     def __init__(self):
@@ -16,11 +27,21 @@ class Node(object):
         raise NotImplementedError
     def visit(self, function, combinator, value):
         raise NotImplementedError
+    # Nodes are never changed once built, so their free variables are kept:
+    # building the semantics of a parse substitutes expressions into each
+    # other and asks for theirs at every level, which would otherwise take
+    # time quadratic in the size of the result.
     def free_variables(self):
+        try:
+            return self._free_variables
+        except AttributeError:
+            self._free_variables = frozenset(self._find_free_variables())
+            return self._free_variables
+    def _find_free_variables(self):
         return self.visit(
             lambda node: node.free_variables(),
             lambda *args: reduce(operator.or_, args),
-            set())
+            frozenset())
     def replace_variable(self, variable, expression, with_alpha_conversion = True):
         return self.visit(
             lambda node: node.replace_variable(variable, expression, with_alpha_conversion),
@@ -81,6 +102,28 @@ class Symbol(Node):
     def simplify(self):
         return self
 
+# A literal number (see numerals.py).
+class Number(Node):
+    def __init__(self, value):
+        super(Number, self).__init__()
+        self.value = value
+    def __str__(self):
+        return str(self.value)
+    def __repr__(self):
+        return "Number(%s)" % repr(self.value)
+    def __eq__(self, other):
+        if not isinstance(other, Number):
+            return False
+        return (self.value) == (other.value)
+    def __hash__(self):
+        return hash((self.value))
+    def visit(self, function, combinator, value):
+        return value
+    def replace_variable(self, variable, expression, with_alpha_conversion = True):
+        return self
+    def simplify(self):
+        return self
+
 class Variable(Node):
     def __init__(self, name):
         super(Variable, self).__init__()
@@ -97,8 +140,8 @@ class Variable(Node):
         return hash((self.name))
     def visit(self, function, combinator, value):
         return value
-    def free_variables(self):
-        return set([self.name])
+    def _find_free_variables(self):
+        return [ self.name ]
     def replace_variable(self, variable, expression, with_alpha_conversion = True):
         return expression if self.name == variable else self
     def simplify(self):
@@ -145,6 +188,7 @@ class Application(Node):
         function = self.function.simplify()
         argument = self.argument.simplify()
         if isinstance(function, Lambda):
+            _local.reductions = getattr(_local, "reductions", 0) + 1
             return function.body.replace_variable(function.variable, argument).simplify()
         else:
             return self.__class__(function, argument)
@@ -173,7 +217,7 @@ class Lambda(Node):
         return hash((self.variable, self.body))
     def visit(self, function, combinator, value):
         return combinator(function(self.variable), function(self.body))
-    def free_variables(self):
+    def _find_free_variables(self):
         return self.body.free_variables() - set([self.variable])
     def replace_variable(self, variable, expression, with_alpha_conversion = True):
         if self.variable == variable:
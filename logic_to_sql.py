@@ -5,26 +5,22 @@ from collections import defaultdict
 import operator
 
 import logic_ast_nodes as nodes
+import counters
+import schema
 
 class SqlGenerator:
-    SYMBOL_MAPPING = {
-        'Consists': 'my_consists',
-        'Count': 'my_consists',
-        'Is': 'my_is',
-        'Takes': 'my_takes',
-        'Have': 'my_have'
-    }
-    DIGIT_MAPPING = {
-        'Ten': 10,
-        'Twenty': 20
-    }
-
-    def __init__(self):
+    # Predicates are looked up in the schema (see schema.py), schema.json
+    # unless another one is given.
+    def __init__(self, use_counters = False, registry = None):
         self.type = None
+        self.use_counters = use_counters
+        self.schema = registry if registry is not None else schema.default()
 
         self.tables = list()
+        self.aliases = {}
         self.variables = defaultdict(set)
         self.constraints = []
+        self.parameters = []
 
         self.stack = []
 
@@ -49,7 +45,7 @@ class SqlGenerator:
         return\
         isinstance(node, nodes.Lambda) and\
         isinstance(body, nodes.Application) and\
-        isinstance(body.argument, nodes.Symbol) and\
+        isinstance(body.argument, (nodes.Symbol, nodes.Number)) and\
         isinstance(body.function, nodes.Application) and\
         isinstance(body.function.argument, nodes.Symbol) and\
         isinstance(variables, list) and\
@@ -66,16 +62,31 @@ class SqlGenerator:
         return\
         isinstance(node, nodes.Lambda)
 
+    def relations(self):
+        return set(map(operator.itemgetter(0), self.tables))
+
+    # Names of the symbols the statement is constrained by; for an INSERT,
+    # the values inserted.
+    def symbols(self):
+        return [ value.name for table, n, value in self.constraints if isinstance(value, nodes.Symbol) ]
+
+    def relation(self, name):
+        return self.schema.predicate(name).table
+
+    def arity(self, name):
+        return len(self.schema.predicate(name))
+
     def resolve_column(self, table, n):
-        return "arg%d" % n
+        return self.aliases[table].column(n)
 
     def resolve_table(self, table):
         if isinstance(table, str):
             return str
         elif isinstance(table, nodes.Symbol):
-            n = self.SYMBOL_MAPPING[table.name]
-            t = "alias%d_%s" % (len(self.tables), n)
-            self.tables.append((n, t))
+            predicate = self.schema.predicate(table.name)
+            t = "alias%d_%s" % (len(self.tables), predicate.table)
+            self.tables.append((predicate.table, t))
+            self.aliases[t] = predicate
             return t
         else:
             raise RuntimeError, "Unable to deduce table name from value: {0}".format(repr(table))
@@ -87,21 +98,29 @@ class SqlGenerator:
             assert(len(value) >= 2)
             return "%s.%s" % (value[0], self.resolve_column(value[0], value[1]))
         elif isinstance(value, nodes.Symbol):
-            if self.DIGIT_MAPPING.has_key(value.name):
-                return repr(self.DIGIT_MAPPING[value.name])
-            else:
-                return repr(value.name)
+            return repr(value.name)
+        elif isinstance(value, nodes.Number):
+            self.parameters.append(value.value)
+            return "?"
         else:
             raise RuntimeError, "Unable to deduce table name from value: {0}".format(repr(value))
 
+    # The query with the parameters of the values resolved since the last
+    # one.
+    def _bind(self, query):
+        parameters, self.parameters = tuple(self.parameters), []
+        return query, parameters
+
     def _visit_function(self, node):
         if isinstance(node, nodes.Application):
             table, values = node.uncurry()
 
+            if isinstance(table, nodes.Symbol) and len(values) > self.arity(table.name):
+                raise RuntimeError, "'{0}' takes at most {1} arguments.".format(table.name, self.arity(table.name))
             table = self.resolve_table(table)
 
             for n, value in enumerate(values):
-                if isinstance(value, nodes.Symbol):
+                if isinstance(value, (nodes.Symbol, nodes.Number)):
                     self.constraints.append((table, n, value))
                 elif isinstance(value, nodes.Variable):
                     self.variables[value.name].add((table, n))
@@ -138,17 +157,17 @@ class SqlGenerator:
         inserted_values = defaultdict(list)
 
         for table, column, value in self.constraints:
-            inserted_values[table].append((self.resolve_column(table, column), self.resolve_value(value)))
+            inserted_values[table].append((self.resolve_column(table, column), value))
         for table in inserted_values.iterkeys():
             columns_and_values = inserted_values[table]
 
             columns = map(operator.itemgetter(0), columns_and_values)
-            values = map(operator.itemgetter(1), columns_and_values)
+            values = map(self.resolve_value, map(operator.itemgetter(1), columns_and_values))
 
             table_clause = "%s(%s)" % (reverse_table_mapping[table], ", ".join(columns))
             values_clause = "(%s)" % (", ".join(values))
 
-            yield "INSERT INTO %s VALUES %s" % (table_clause, values_clause)
+            yield self._bind("INSERT INTO %s VALUES %s" % (table_clause, values_clause))
 
     def make_is_exist(self, node):
         self.type = "SELECT"
@@ -166,8 +185,8 @@ class SqlGenerator:
             lambda c: "%s = %s" % (self.resolve_value(c[0:2]), self.resolve_value(c[2])),
             self.constraints))
 
-        yield "SELECT CASE WHEN count(*)=0 THEN 'NO' ELSE 'YES' END FROM {0} WHERE {1}".format(from_clause,
-            where_clause)
+        yield self._bind("SELECT CASE WHEN count(*)=0 THEN 'NO' ELSE 'YES' END FROM {0} WHERE {1}".format(from_clause,
+            where_clause))
 
     def make_select(self, node):
         self.type = "SELECT"
@@ -186,12 +205,15 @@ class SqlGenerator:
         where_clause = " AND ".join(map(
             lambda c: "%s = %s" % (self.resolve_value(c[0:2]), self.resolve_value(c[2])),
             self.constraints))
-        yield "SELECT {0} FROM {1} WHERE {2}".format(result_clause, from_clause, where_clause)
+        yield self._bind("SELECT {0} FROM {1} WHERE {2}".format(result_clause, from_clause, where_clause))
 
     def make_distinct_select(self, node):
+        self.type = "SELECT"
+
         variables, body = node.argument.uncurry()
-        from_clause = self.SYMBOL_MAPPING[body.function.function.name]
-        yield "SELECT {0} FROM {1}".format("DISTINCT arg1", from_clause)
+        from_clause = self.relation(body.function.function.name)
+        self.tables.append((from_clause, from_clause))
+        yield self._bind("SELECT DISTINCT {0} FROM {1}".format(self.schema.by_table[from_clause].column(1), from_clause))
 
     # generating a 'count' query
     def make_count(self, node):
@@ -200,21 +222,40 @@ class SqlGenerator:
         variables, body = node.argument.uncurry()
 
         if len(variables) == 2:
-            from_clause = self.SYMBOL_MAPPING[body.function.function.name]
-            yield "SELECT {0} FROM {1}".format("COUNT(DISTINCT arg0)", from_clause)
+            from_clause = self.relation(body.function.function.name)
+            self.tables.append((from_clause, from_clause))
+            if self.use_counters and self.schema.by_table[from_clause].aggregated:
+                yield self._bind(counters.make_distinct_count_lookup(from_clause, 0))
+            else:
+                yield self._bind("SELECT COUNT(DISTINCT {0}) FROM {1}".format(self.schema.by_table[from_clause].column(0), from_clause))
         else:
             self._visit_combinator(self._visit_function(body))
 
             self._induce_variable_constraints()
 
-            group_count = 'COUNT'
+            if self.use_counters:
+                if node.function.name == 'Count':
+                    query = self.make_counter_lookup()
+                else:
+                    query = self.make_total_lookup()
+                if query is not None:
+                    yield self._bind(query)
+                    return
 
             if node.function.name == 'Sum':
-                group_count = 'Sum'
+                # A sum of nothing is 0, as in materialized totals; a whole
+                # with a cost of its own costs that much.
+                whole = self._summed_whole()
+                own = [ self._make_own_cost(whole) ] if whole is not None else []
+                aggregate = lambda column: "COALESCE(%s)" % ", ".join(own + [ "SUM(%s)" % column, "0" ])
+            else:
+                aggregate = lambda column: "COUNT(%s)" % column
 
+            # Variables joining relations ("how much is pizza" sums the
+            # costs of the ingredients of pizza) are not aggregated.
             result_clause = ", ".join(map(
-                lambda kv: group_count + "(%s) AS %s" % (self.resolve_value(list(kv[1])[0]), kv[0]),
-                self.variables.items()))
+                lambda kv: "%s AS %s" % (aggregate(self.resolve_value(list(kv[1])[0])), kv[0]),
+                [ (variable, columns) for variable, columns in self.variables.items() if len(columns) == 1 ]))
             from_clause = ", ".join(map(
                 lambda t: "%s AS %s" % t,
                 self.tables))
@@ -222,8 +263,54 @@ class SqlGenerator:
             where_clause = " AND ".join(map(
                 lambda c: "%s = %s" % (self.resolve_value(c[0:2]), self.resolve_value(c[2])),
                 self.constraints))
-            yield "SELECT {0} FROM {1} WHERE {2}".format(result_clause, from_clause, where_clause)
-
+            yield self._bind("SELECT {0} FROM {1} WHERE {2}".format(result_clause, from_clause, where_clause))
+
+    # A single-relation count with one counted and one bound argument
+    # ("how many dishes are kosher") is answered from materialized counters.
+    def make_counter_lookup(self):
+        if len(self.tables) != 1 or len(self.variables) != 1 or len(self.constraints) != 1:
+            return None
+
+        relation, alias = self.tables[0]
+        (counted,) = self.variables.values()
+        table, n, value = self.constraints[0]
+
+        if not isinstance(value, nodes.Symbol) or (alias, n) in counted or not self.aliases[alias].aggregated:
+            return None
+
+        return counters.make_count_lookup(relation, n, self.resolve_value(value))
+
+    # The whole whose parts' costs are summed ("how much is pizza"), if the
+    # query is such a sum.
+    def _summed_whole(self):
+        if self.schema.totals is None or len(self.constraints) != 2:
+            return None
+        if [ relation for relation, alias in self.tables ] != [ predicate.table for predicate in self.schema.totals ]:
+            return None
+
+        (parts, parts_alias), (costs, costs_alias) = self.tables
+        bound = [ value for table, n, value in self.constraints if (table, n) == (parts_alias, 0) ]
+        summed = [ columns for columns in self.variables.values() if len(columns) == 1 ]
+
+        if len(bound) != 1 or not isinstance(bound[0], nodes.Symbol) or summed != [ set([ (costs_alias, 1) ]) ]:
+            return None
+        return bound[0]
+
+    def _make_own_cost(self, whole):
+        costs = self.aliases[self.tables[1][1]]
+        return "(SELECT SUM({0}) FROM {1} WHERE {2} = {3})".format(
+            costs.column(1), costs.table, costs.column(0), self.resolve_value(whole))
+
+    # A sum of the costs of the parts of a whole is answered from
+    # materialized totals.
+    def make_total_lookup(self):
+        whole = self._summed_whole()
+        if whole is None or not all(self.aliases[alias].aggregated for relation, alias in self.tables):
+            return None
+        return counters.make_total_lookup(self.tables[1][0], self.resolve_value(whole))
+
+    # Yields (query, parameters) for every statement; numbers are bound as
+    # parameters.
     def make_sql(self, node):
         generator = None
         if self.is_distinct_select(node):
@@ -0,0 +1,245 @@
+#!/usr/bin/python
+################################################################################
+# Canonical LR(1) parsing table for the grammar loaded by earley.load_grammar,
+# used as a fast path in front of the Earley parser.
+#
+# The table is built for the whole grammar. Cells with more than one action
+# are conflicts: the grammar is not LR(1) there. A question is parsed with
+# the table as long as every cell it visits is deterministic; a parse which
+# reaches a conflict (or fails) is handed over to the Earley parser, which
+# deals with ambiguity, partial parses and error reporting. A parse which
+# never meets a conflict is the only parse of the question, so the fast path
+# answers exactly what earley.parse_best_stream() would, with the same parse
+# tree (Node and State objects) and semantics.
+#
+# Words of an external lexicon (earley.LexicalTerm) are terminals of the
+# table standing for their whole category; a token is matched against them
+# by looking it up in the lexicon. Phrases (earley.Phrase) are terminals
+# matching several tokens. Input which matches more than one terminal of a
+# state, or more than one entry of the lexicon, is a conflict.
+#
+# Usage: python lr.py [repl.txt [repl.lex]]   (prints the conflicts of the grammar)
+
+import sys
+
+import earley
+import profiling
+
+END = None # The end of input marker.
+
+SHIFT = "shift"
+REDUCE = "reduce"
+ACCEPT = "accept"
+
+class Conflict(Exception):
+    pass
+
+class ParseTable(object):
+    def __init__(self, starting_rule):
+        self.starting_rule = starting_rule
+        self.gamma = earley.Production(earley.logic.parse_logic_expression("S"), (starting_rule, "S"))
+
+        # Production 0 is the augmented GAMMA -> S production.
+        self.productions = [ (earley.GAMMA_RULE, self.gamma) ]
+        self.rules = {}
+        for rule in earley.get_rules(starting_rule):
+            self.rules[rule.name] = []
+            for production in rule.productions:
+                self.rules[rule.name].append(len(self.productions))
+                self.productions.append((rule.name, production))
+
+        self.first_cache = {}
+        self.action = []
+        self.goto = []
+        self.build()
+        # Lexical terms and phrases each state has actions for.
+        self.patterns = [
+            [ key for key in action if isinstance(key, (earley.LexicalTerm, earley.Phrase)) ]
+            for action in self.action ]
+
+    # Terminals which may start the terms of the production from the index
+    # on, followed by the lookahead.
+    def first(self, index, start, lookahead):
+        key = (index, start, lookahead)
+        if key not in self.first_cache:
+            result = set()
+            production = self.productions[index][1]
+            for term in production.terms[start:]:
+                term = term[0]
+                if not isinstance(term, earley.Rule):
+                    result.add(term)
+                    break
+                result |= term.first
+                if not term.nullable:
+                    break
+            else:
+                result.add(lookahead)
+            self.first_cache[key] = frozenset(result)
+        return self.first_cache[key]
+
+    def closure(self, items):
+        result = set(items)
+        pending = list(items)
+        while pending:
+            index, dot, lookahead = pending.pop()
+            production = self.productions[index][1]
+            if dot == len(production):
+                continue
+            term = production[dot]
+            if not isinstance(term, earley.Rule):
+                continue
+            for follow in self.first(index, dot + 1, lookahead):
+                for next_index in self.rules[term.name]:
+                    item = (next_index, 0, follow)
+                    if item not in result:
+                        result.add(item)
+                        pending.append(item)
+        return frozenset(result)
+
+    def build(self):
+        states = [ self.closure([ (0, 0, END) ]) ]
+        numbers = { states[0]: 0 }
+
+        for items in states:
+            action = {}
+            goto = {}
+            transitions = {}
+            for index, dot, lookahead in items:
+                name, production = self.productions[index]
+                if dot == len(production):
+                    if index == 0:
+                        action.setdefault(lookahead, set()).add((ACCEPT, 0))
+                    else:
+                        action.setdefault(lookahead, set()).add((REDUCE, index))
+                else:
+                    term = production[dot]
+                    symbol = term.name if isinstance(term, earley.Rule) else term
+                    transitions.setdefault((symbol, isinstance(term, earley.Rule)), []).append((index, dot + 1, lookahead))
+
+            for (symbol, is_rule), kernel in transitions.iteritems():
+                target = self.closure(kernel)
+                if target not in numbers:
+                    numbers[target] = len(states)
+                    states.append(target)
+                if is_rule:
+                    goto[symbol] = numbers[target]
+                else:
+                    action.setdefault(symbol, set()).add((SHIFT, numbers[target]))
+
+            self.action.append(dict((key, tuple(value)) for key, value in action.iteritems()))
+            self.goto.append(goto)
+
+    def conflicts(self):
+        for state, action in enumerate(self.action):
+            for lookahead, actions in action.iteritems():
+                if len(actions) > 1:
+                    yield state, lookahead, actions
+
+    def describe(self, action):
+        kind, argument = action
+        if kind == REDUCE:
+            name, production = self.productions[argument]
+            return "reduce %s -> %r" % (name, production)
+        return "%s %d" % (kind, argument)
+
+    # Parses the tokens as earley.parse_best_stream() would. Raises Conflict
+    # if the parse meets a conflict or fails.
+    def parse(self, tokens):
+        columns = [ earley.Column(0, None) ] + [ earley.Column(i + 1, token) for i, token in enumerate(tokens) ]
+        stack = [ 0 ]
+        # (start position, state) for every symbol on the stack; the state
+        # is None for terminals.
+        values = []
+        # Lexicon productions of the tokens shifted as lexical terms.
+        entries = {}
+        position = 0
+
+        while True:
+            lookahead = tokens[position] if position < len(tokens) else END
+            action = self.action[stack[-1]]
+            actions = action.get(lookahead)
+            width, entry = 1, None
+            if lookahead is not END:
+                for term in self.patterns[stack[-1]]:
+                    if isinstance(term, earley.Phrase):
+                        if tuple(tokens[position:position + len(term.words)]) != term.words:
+                            continue
+                        matches = [ (len(term.words), None) ]
+                    else:
+                        matches = list(term.match(tokens, position))
+                        if not matches:
+                            continue
+                    if actions is not None or len(matches) > 1:
+                        raise Conflict(position)
+                    actions = action[term]
+                    width, entry = matches[0]
+            if actions is None or len(actions) > 1:
+                raise Conflict(position)
+            kind, argument = actions[0]
+
+            if kind == SHIFT:
+                stack.append(argument)
+                values.append((position, None))
+                if entry is not None:
+                    entries[position] = entry
+                position += width
+            elif kind == REDUCE:
+                name, production = self.productions[argument]
+                count = len(production)
+                if count == 1 and isinstance(production[0], earley.LexicalTerm):
+                    production = entries[values[-1][0]]
+                children = values[len(values) - count:] if count else []
+                if count:
+                    del stack[-count:]
+                    del values[-count:]
+                start = children[0][0] if children else position
+                state = earley.State(
+                    name,
+                    production,
+                    [ child.get_semantics() if child is not None else None for _, child in children ],
+                    count,
+                    columns[start],
+                    columns[position])
+                state.children = [ child for _, child in children if child is not None ]
+                stack.append(self.goto[stack[-1]][name])
+                values.append((start, state))
+            else:
+                start, child = values[-1]
+                gamma = earley.State(
+                    earley.GAMMA_RULE, self.gamma, [ child.get_semantics() ], 1, columns[0], columns[position])
+                gamma.children = [ child ]
+                return gamma.get_semantics(), make_tree(gamma)
+
+def make_tree(state):
+    return earley.Node(state, [ make_tree(child) for child in state.children ])
+
+# The best parse of the tokens and the number of parses, as returned by
+# earley.parse_best_stream(); questions which the table cannot parse
+# deterministically go to the Earley parser.
+def parse_best_stream(table, tokens, profile = None):
+    if profile is None:
+        profile = profiling.NULL_PROFILE
+
+    try:
+        with profile.stage("parse"):
+            variant = table.parse(tokens)
+        profile.count("fast_path")
+        profile.count("trees")
+        return variant, 1
+    except Conflict:
+        return earley.parse_best_stream(table.starting_rule, tokens, profile)
+
+if __name__ == "__main__":
+    import repl
+
+    grammar = sys.argv[1] if len(sys.argv) > 1 else "repl.txt"
+    lexicon = sys.argv[2] if len(sys.argv) > 2 else "repl.lex"
+    table = ParseTable(repl.load_grammar(grammar, lexicon))
+
+    conflicts = list(table.conflicts())
+    print "%d productions, %d states, %d conflicting cells" % (len(table.productions), len(table.action), len(conflicts))
+    for state, lookahead, actions in conflicts:
+        print
+        print "state %d, lookahead %r:" % (state, lookahead)
+        for action in actions:
+            print "   ", table.describe(action)
@@ -0,0 +1,36 @@
+#!/usr/bin/python
+################################################################################
+# Bounded memo of a function of one argument, such as the productions of a
+# word in a lexicon or its normal form.
+#
+# Once the memo holds size values it is cleared and starts over, which keeps
+# it bounded at no cost per lookup. Memos are shared by the threads of the
+# server, so another thread may clear one at any time: a value is returned
+# as computed, never read back after it was stored.
+
+class Memo(object):
+    def __init__(self, function, size = 10000):
+        self.function = function
+        self.size = size
+        self.values = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __call__(self, key):
+        try:
+            return self.values[key]
+        except KeyError:
+            pass
+        if len(self.values) >= self.size:
+            self.values.clear()
+        value = self.function(key)
+        self.values[key] = value
+        return value
+
+    # Forgets the value of the key, if any, as when it has changed.
+    def forget(self, key):
+        self.values.pop(key, None)
+
+    def clear(self):
+        self.values.clear()
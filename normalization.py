@@ -0,0 +1,95 @@
+#!/usr/bin/python
+################################################################################
+# Normalization of the tokens of a question before parsing.
+#
+# Every token goes through a pipeline of stages, each taking a word and
+# returning its normal form (or None to drop it):
+#   * strip_punctuation: "vegetarian?" -> "vegetarian", "," -> dropped;
+#   * lemmatize:         "consists" -> "consist", "dishes" -> "dish",
+#                        "does" -> "do", by a table of suffixes and a table
+#                        of exceptions.
+# The grammar (and the lexicon) is written in normal forms only, so every
+# inflection of a word is one terminal rather than a production per form.
+# Numbers are left as they are and recognized by the parser (see
+# numerals.py).
+#
+# Normal forms are cached by word, so the pipeline runs once per distinct
+# word rather than once per question.
+
+import string
+
+import earley
+import memo
+
+def strip_punctuation(word):
+    return word.strip(string.punctuation) or None
+
+# Tried in order; the first suffix the word ends with is replaced.
+SUFFIXES = [
+    ("sses", "ss"),
+    ("shes", "sh"),
+    ("ches", "ch"),
+    ("xes", "x"),
+    ("zes", "z"),
+    ("oes", "o"),
+    ("ies", "y"),
+    ("ss", "ss"),
+    ("us", "us"),
+    ("is", "is"),
+    ("s", "")
+]
+
+# Words the suffixes get wrong: plurals of nouns ending in "ie" and nouns
+# which merely end like plurals.
+EXCEPTIONS = {
+    "is": "is",
+    "has": "have",
+    "does": "do",
+    "calories": "calorie",
+    "this": "this",
+    "pies": "pie",
+    "cookies": "cookie",
+    "brownies": "brownie",
+    "smoothies": "smoothie",
+    "veggies": "veggie",
+    "molasses": "molasses"
+}
+
+# Words this short are function words ("is", "as", "us") more often than
+# plurals, and are only changed by the exceptions.
+MIN_LEMMATIZED_LENGTH = 4
+
+def lemmatize(word):
+    if word in EXCEPTIONS:
+        return EXCEPTIONS[word]
+    if len(word) < MIN_LEMMATIZED_LENGTH or not word.isalpha():
+        return word
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix):
+            return word[:len(word) - len(suffix)] + replacement
+    return word
+
+STAGES = [ strip_punctuation, lemmatize ]
+
+class Normalizer(object):
+    def __init__(self, stages = None):
+        self.stages = STAGES if stages is None else stages
+        self.cache = memo.Memo(self._normalize_word)
+
+    def normalize_word(self, word):
+        return self.cache(word)
+
+    def _normalize_word(self, word):
+        for stage in self.stages:
+            word = stage(word)
+            if word is None:
+                break
+        return word
+
+    def normalize(self, tokens):
+        normalized = [ self.normalize_word(token) for token in tokens ]
+        return [ token for token in normalized if token is not None ]
+
+    def tokenize(self, text):
+        return self.normalize(earley.tokenize(text))
+
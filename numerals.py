@@ -0,0 +1,109 @@
+#!/usr/bin/python
+################################################################################
+# Numbers in questions as a category of the grammar.
+#
+# A numeral is written in digits ("20", "1,500", "2.5") or in words up to
+# millions ("twenty", "three hundred forty two", "2 million", "one million
+# two hundred thousand"). Numerals are attached to a grammar the way a
+# lexicon is (see lexicon.py), as a category (NUM by default) whose words
+# are all the numerals, each with a Number of its value as semantics, so
+# that no number needs a rule of its own.
+#
+# Usage: python numerals.py WORD...
+
+import sys
+
+import earley
+import memo
+import logic_ast_nodes
+
+NUMBERS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90
+}
+
+# Largest first.
+SCALES = [ ("million", 1000000), ("thousand", 1000) ]
+
+def parse_digits(word):
+    digits = word.replace(",", "")
+    if digits.isdigit():
+        return int(digits)
+    whole, point, fraction = digits.partition(".")
+    if point and whole.isdigit() and fraction.isdigit():
+        return float(digits)
+    return None
+
+# Value of a group of words below a thousand ("three hundred forty two"),
+# or of digits followed by a scale ("2" of "2 million").
+def parse_group(words):
+    if len(words) == 1 and parse_digits(words[0]) is not None:
+        return parse_digits(words[0])
+    value = 0
+    if len(words) >= 2 and words[1] == "hundred":
+        if not 1 <= NUMBERS.get(words[0], 0) <= 9:
+            return None
+        value, words = NUMBERS[words[0]] * 100, words[2:]
+        if len(words) == 0:
+            return value
+    if len(words) == 1 and words[0] in NUMBERS:
+        return value + NUMBERS[words[0]]
+    if len(words) == 2 and NUMBERS.get(words[0], 0) >= 20 and 1 <= NUMBERS.get(words[1], 0) <= 9:
+        return value + NUMBERS[words[0]] + NUMBERS[words[1]]
+    return None
+
+# Value of the words of a numeral, or None if they are not one.
+def parse_number(words):
+    value = 0
+    for scale, multiplier in SCALES:
+        if scale in words:
+            position = words.index(scale)
+            group = parse_group(words[:position])
+            if not group:
+                return None
+            value, words = value + group * multiplier, words[position + 1:]
+    if len(words) > 0:
+        group = parse_group(words)
+        if group is None:
+            return None
+        value += group
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return value
+
+class Numerals(object):
+    def __init__(self, category = "NUM"):
+        self.category = category
+        self.categories = [ category ]
+        self.empty = logic_ast_nodes.Empty()
+        self.cache = memo.Memo(self._make_productions)
+
+    def _get(self, words):
+        return self.cache(words)
+
+    def _make_productions(self, words):
+        value = parse_number(words.split(" "))
+        if value is None:
+            return ()
+        return (earley.Production(logic_ast_nodes.Number(value), (words, self.empty)),)
+
+    def lookup(self, words):
+        return [ (self.category, str(production.semantics)) for production in self._get(words) ]
+
+    def productions(self, words, category):
+        if category != self.category:
+            return ()
+        return self._get(words)
+
+    # Every prefix of a numeral is a numeral itself.
+    def continues(self, words, category = None):
+        if category is not None and category != self.category:
+            return False
+        return len(self._get(words)) > 0
+
+if __name__ == "__main__":
+    print parse_number(sys.argv[1:])
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+################################################################################
+# Per-stage latency instrumentation for the question pipeline.
+#
+# A Profile collects wall-clock time per pipeline stage (parse, build_trees,
+# simplify, sql, execute) together with work counters (chart states,
+# predictions, completions, trees, beta reductions, rows). A TraceSink
+# appends finished profiles to a file as JSON lines, one question per line.
+
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class Profile(object):
+    def __init__(self, question = None):
+        self.question = question
+        self.started = time.time()
+        self.timings = OrderedDict()
+        self.counters = OrderedDict()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.time() - started
+
+    def count(self, name, value = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def total(self):
+        return sum(self.timings.itervalues())
+
+    def as_dict(self):
+        return {
+            "time": self.started,
+            "question": self.question,
+            "total": self.total(),
+            "timings": self.timings,
+            "counters": self.counters
+        }
+
+    def __str__(self):
+        timings = ", ".join("%s %.2f ms" % (name, value * 1000) for name, value in self.timings.iteritems())
+        counters = ", ".join("%s=%d" % item for item in self.counters.iteritems())
+        return "%.2f ms total: %s; %s" % (self.total() * 1000, timings, counters)
+
+# Stands in when profiling is disabled; records nothing.
+class NullProfile(Profile):
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def count(self, name, value = 1):
+        pass
+
+NULL_PROFILE = NullProfile()
+
+class TraceSink(object):
+    def __init__(self, path):
+        self.path = path
+        self.stream = open(path, "a")
+        self.lock = threading.Lock()
+
+    def write(self, profile):
+        line = json.dumps(profile.as_dict())
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def close(self):
+        with self.lock:
+            self.stream.close()
@@ -3,17 +3,45 @@
 
 import sys
 import cmd
-import sqlite3
 import traceback
+import sqlite3
 
 import earley
+import lexicon
+import normalization
+import numerals
+import entity_index
+import lr
 import logic_to_sql
+import answer_cache
+import counters
+import connection_pool
+import profiling
+import logic_ast_nodes
+import schema
+import bulk_import
+
+# Predicates and their tables are declared in schema.json.
+SCHEMA = schema.default()
 
 def filter_comments(in_lines):
     return [line for line in in_lines if len(line.strip()) and not line.strip()[0] == '#']
 
+# The grammar of the REPL with the nouns of its lexicon and numerals
+# attached. It is written for normalized tokens, see tokenize().
+def load_grammar(grammar = "repl.txt", lexicon_path = "repl.lex"):
+    starting_rule = earley.load_grammar(filter_comments(open(grammar, "r").readlines()))
+    lexicon.attach(lexicon.Lexicon(lexicon_path), starting_rule)
+    lexicon.attach(numerals.Numerals(), starting_rule)
+    return starting_rule
+
+NORMALIZER = normalization.Normalizer()
+
+def tokenize(text):
+    return NORMALIZER.tokenize(text)
+
 class SimpleREPL(cmd.Cmd):
-    def __init__(self, stream):
+    def __init__(self, stream, database = "example.db"):
         print repr(stream)
         cmd.Cmd.__init__(self, "Tab", stream)
         self.prompt = ">> "
@@ -26,51 +54,85 @@ There are a few service commands:
   .dump     Dumps all tables
   .debug    Enables/disables NLP debugging
   .trace    Enables/disables SQL tracing
+  .cache    Shows answer cache statistics
+  .counters Enables/disables materialized COUNT counters and SUM totals
+  .profile  Enables/disables per-stage profiling (appends to profile.jsonl)
+  .import   Imports facts from CSV or JSON lines files (.import FILE...)
 """
         self.interactive = (stream == sys.stdin)
-        self.connection = sqlite3.connect("example.db")
-        self.grammar = earley.load_grammar(filter_comments(open("repl.txt", "r").readlines()))
+        self.pool = connection_pool.ConnectionPool(database)
+        self.grammar = load_grammar()
+        self.entities = entity_index.EntityIndex(normalizer = NORMALIZER, new_category = "N/NEW")
+        self.entities.attach(self.grammar)
+        self.entities.load(self.pool, SCHEMA)
+        self.parse_table = lr.ParseTable(self.grammar)
+        self.cache = answer_cache.AnswerCache()
+        self.counters = self._has_table(counters.COUNTERS_TABLE)
         self.debug = True
         self.trace = True
+        self.profile = None
 
         if not self.interactive:
             self.use_rawinput = False
 
-    def _execute(self, query):
+    def _execute(self, query, parameters = ()):
         if self.trace:
-            print "<", query
+            if parameters:
+                print "<", query, list(parameters)
+            else:
+                print "<", query
 
-        cursor = self.connection.cursor()
-        for row in cursor.execute(query):
+        for row in self.pool.execute(query, parameters):
             yield row
-        cursor.close()
-
-        self.connection.commit()
 
     def _execute_sync(self, query):
         for row in self._execute(query):
             pass
 
+    def _has_table(self, name):
+        return len(self.pool.read("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))) > 0
+
+    def _execute_cached(self, generator, query, parameters):
+        if generator.type != "SELECT":
+            rows = list(self._execute(query, parameters))
+            self.cache.invalidate(generator.relations())
+            if generator.type == "INSERT":
+                for symbol in generator.symbols():
+                    self.entities.add(symbol)
+            return rows
+
+        rows = self.cache.get(query, parameters)
+        if rows is None:
+            rows = list(self._execute(query, parameters))
+            self.cache.put(query, parameters, rows, generator.relations())
+        elif self.trace:
+            print "< (cached)", query
+        return rows
+
     def cmd_init(self):
-        self._execute_sync("CREATE TABLE my_consists(arg0 TEXT, arg1 TEXT)")
-        self._execute_sync("CREATE TABLE my_is(arg0 TEXT, arg1 TEXT)")
-        self._execute_sync("CREATE TABLE my_takes(arg0 TEXT, arg1 TEXT)")
-        self._execute_sync("CREATE TABLE my_have(arg0 TEXT, arg1 NUMBER)")
-        # self._execute_sync("CREATE TABLE my_hates(arg0 TEXT, arg1 TEXT)")
+        self.cache.clear()
+        for predicate in SCHEMA:
+            for query in predicate.make_create(self.pool.columns(predicate.table)):
+                self._execute_sync(query)
+        if self.counters:
+            for query in counters.make_create_counters(SCHEMA.aggregated(), SCHEMA.totals):
+                self._execute_sync(query)
 
     def cmd_fini(self):
-        self._execute_sync("DROP TABLE my_consists")
-        self._execute_sync("DROP TABLE my_is")
-        self._execute_sync("DROP TABLE my_takes")
-        self._execute_sync("DROP TABLE my_have")
-        # self._execute_sync("DROP TABLE my_hates")
+        self.cache.clear()
+        self.entities.clear()
+        for query in counters.make_drop_counters(SCHEMA):
+            self._execute_sync(query)
+        for predicate in SCHEMA:
+            for query in predicate.make_drop():
+                self._execute_sync(query)
 
     def cmd_clear(self):
-        self._execute_sync("DELETE FROM my_consists")
-        self._execute_sync("DELETE FROM my_is")
-        self._execute_sync("DELETE FROM my_takes")
-        self._execute_sync("DELETE FROM my_have")
-        # self._execute_sync("DELETE FROM my_hates")
+        self.cache.clear()
+        self.entities.clear()
+        for predicate in SCHEMA:
+            for query in predicate.make_clear():
+                self._execute_sync(query)
 
     def cmd_debug(self):
         if self.debug:
@@ -88,26 +150,58 @@ There are a few service commands:
             self.trace = True
             print "SQL tracing enabled."
 
+    def cmd_counters(self):
+        self.cache.clear()
+        if self.counters:
+            for query in counters.make_drop_counters(SCHEMA):
+                self._execute_sync(query)
+            self.counters = False
+            print "Materialized counters disabled."
+        else:
+            for query in counters.make_create_counters(SCHEMA.aggregated(), SCHEMA.totals):
+                self._execute_sync(query)
+            self.counters = True
+            print "Materialized counters enabled."
+
     def cmd_dump(self):
-        print "== Consists =" + "=" * 70
-        for row in self._execute("SELECT * FROM my_consists"):
-            print ":", "Consists(%s)" % ", ".join(row)
-        
-        print "== Is =" + "=" * 70
-        for row in self._execute("SELECT * FROM my_is"):
-            print ":", "Is(%s)" % ", ".join(row)
-        
-        print "== Takes =" + "=" * 70
-        for row in self._execute("SELECT * FROM my_takes"):
-            print ":", "Takes(%s)" % ", ".join(row)
-
-        print "== Have =" + "=" * 70
-        for row in self._execute("SELECT * FROM my_have"):
-            print ":", "Have(%s)" % ", ".join(tuple([row[0],str(row[1])]))
-
-    def cmd_eval(self, semantics):
-        for query in logic_to_sql.SqlGenerator().make_sql(semantics):
-            for row in self._execute(query):
+        for predicate in SCHEMA:
+            print "== %s =" % predicate.name + "=" * 70
+            for row in self._execute("SELECT * FROM {0}".format(predicate.table)):
+                # Arguments left out are NULL at the end of the row.
+                values = list(row)
+                while len(values) > 0 and values[-1] is None:
+                    values.pop()
+                print ":", "%s(%s)" % (predicate.name, ", ".join([ str(value) for value in values ]))
+
+    def cmd_profile(self):
+        if self.profile:
+            self.profile.close()
+            self.profile = None
+            print "Profiling disabled."
+        else:
+            self.profile = profiling.TraceSink("profile.jsonl")
+            print "Profiling enabled; traces are appended to %s." % self.profile.path
+
+    def cmd_import(self, paths):
+        importer = bulk_import.Importer(self.pool, SCHEMA, use_counters = self.counters)
+        statistics, seconds = importer.load(paths)
+        self.cache.invalidate(statistics.keys())
+        self.entities.load(self.pool, [ SCHEMA.by_table[table] for table in statistics ])
+        print bulk_import.report(statistics, seconds)
+
+    def cmd_cache(self):
+        statistics = self.cache.statistics()
+        print "Answer cache: %(size)d/%(capacity)d entries, %(hits)d hits, %(misses)d misses, %(invalidations)d invalidations, %(evictions)d evictions." % statistics
+
+    def cmd_eval(self, semantics, profile = profiling.NULL_PROFILE):
+        generator = logic_to_sql.SqlGenerator(use_counters = self.counters)
+        with profile.stage("sql"):
+            queries = list(generator.make_sql(semantics))
+        for query, parameters in queries:
+            with profile.stage("execute"):
+                rows = self._execute_cached(generator, query, parameters)
+            profile.count("rows", len(rows))
+            for row in rows:
                 print ":", " ".join([str(element) for element in row])
 
     def emptyline(self):
@@ -129,31 +223,51 @@ There are a few service commands:
                 self.cmd_trace()
             elif string == ".dump":
                 self.cmd_dump()
+            elif string == ".cache":
+                self.cmd_cache()
+            elif string == ".counters":
+                self.cmd_counters()
+            elif string == ".profile":
+                self.cmd_profile()
+            elif string.split(" ")[0] == ".import":
+                self.cmd_import(string.split()[1:])
             elif string == "what is the meaning of life":
                 print "42."
             else:
-                variants = earley.parse(self.grammar, string)
-
-                if len(variants) == 0:
+                profile = profiling.Profile(string) if self.profile else profiling.NULL_PROFILE
+                with profile.stage("normalize"):
+                    tokens = tokenize(string)
+                try:
+                    variant, count = lr.parse_best_stream(self.parse_table, tokens, profile)
+                except earley.ParseError as e:
                     print '(!) Unable to parse query.'
-                elif len(variants) > 1:
-                    print '(!) Query is ambiguous.'
-                    for semantics, tree in variants:
-                        print "    ", earley.qtree(tree)
+                    for start, end, tree in earley.recover(self.grammar, e, tokens, profile):
+                        if tree is None:
+                            print "     ?", " ".join(tokens[start:end])
+                        else:
+                            print "    ", earley.qtree(tree)
                 else:
-                    semantics, tree = variants[0]
+                    if count > 1:
+                        print '(!) Query is ambiguous ({0} parses), answering with the best one.'.format(count)
+                    semantics, tree = variant
+                    with profile.stage("simplify"):
+                        simplified, reductions = logic_ast_nodes.simplify(semantics)
+                    profile.count("beta_reductions", reductions)
                     if self.debug:
                         print
                         print "T=", string
                         print "Q=", earley.qtree(tree)
                         print "S=", semantics
-                        print "S=", semantics.simplify()
+                        print "S=", simplified
                         print
-                    self.cmd_eval(semantics.simplify())
+                    self.cmd_eval(simplified, profile)
+                if self.profile:
+                    print "Profile:", profile
+                    self.profile.write(profile)
             print
             print "Okay."
             print
-        except RuntimeError as e:
+        except (RuntimeError, sqlite3.Error) as e:
             traceback.print_exc()
 
     def do_EOF(self, line):
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+################################################################################
+# Schema of the knowledge base: the predicates of the logic and the tables
+# they are stored in.
+#
+# The schema is read from a JSON file (schema.json) listing every predicate
+# with its table, the types of its arguments, the indexes over them and
+# whether materialized counters are kept for it (see counters.py):
+#
+#   {"predicates": [
+#     {"name": "Have", "table": "my_have", "columns": ["TEXT", "NUMBER"],
+#      "indexes": [[0]], "aggregated": true}, ...],
+#    "totals": {"parts": "Consists", "costs": "Costs"}}
+#
+# "totals" names the predicate relating wholes to their parts and the one
+# giving the costs of things, whose sums counters.py may materialize.
+#
+# The columns of a table are named after the positions of the arguments,
+# arg0, arg1, ... A predicate may be applied to fewer arguments than it has
+# columns; the others are left NULL.
+#
+# Usage: python schema.py [schema.json]   (prints the tables and indexes)
+
+import os
+import sys
+import json
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.json")
+
+TYPES = [ "TEXT", "NUMBER", "INTEGER", "REAL" ]
+
+class Predicate(object):
+    def __init__(self, name, table, columns, indexes = (), aggregated = False):
+        self.name = name
+        self.table = table
+        self.columns = list(columns)
+        self.indexes = [ tuple(index) for index in indexes ]
+        self.aggregated = aggregated
+
+    def __len__(self):
+        return len(self.columns)
+
+    def column(self, n):
+        return "arg%d" % n
+
+    # Creates the table and its indexes unless they exist, and adds the
+    # columns a table created by an older schema lacks.
+    def make_create(self, existing_columns = ()):
+        for query in self.make_create_table(existing_columns):
+            yield query
+        for query in self.make_create_indexes():
+            yield query
+
+    def make_create_table(self, existing_columns = ()):
+        yield "CREATE TABLE IF NOT EXISTS {0}({1})".format(self.table, ", ".join(
+            "%s %s" % (self.column(n), type) for n, type in enumerate(self.columns)))
+        if len(existing_columns) > 0:
+            for n, type in enumerate(self.columns):
+                if self.column(n) not in existing_columns:
+                    yield "ALTER TABLE {0} ADD COLUMN {1} {2}".format(self.table, self.column(n), type)
+
+    def make_create_indexes(self):
+        for index in self.indexes:
+            yield "CREATE INDEX IF NOT EXISTS {0} ON {1}({2})".format(
+                self.index_name(index), self.table, ", ".join(self.column(n) for n in index))
+
+    def make_drop_indexes(self):
+        for index in self.indexes:
+            yield "DROP INDEX IF EXISTS {0}".format(self.index_name(index))
+
+    def index_name(self, index):
+        return "_".join([ self.table ] + [ self.column(n) for n in index ])
+
+    def make_drop(self):
+        yield "DROP TABLE {0}".format(self.table)
+
+    def make_clear(self):
+        yield "DELETE FROM {0}".format(self.table)
+
+class Schema(object):
+    # Totals are the (parts, costs) predicates, if any.
+    def __init__(self, predicates, totals = None):
+        self.predicates = list(predicates)
+        self.by_name = dict((predicate.name, predicate) for predicate in self.predicates)
+        self.by_table = dict((predicate.table, predicate) for predicate in self.predicates)
+        self.totals = totals
+
+    def __iter__(self):
+        return iter(self.predicates)
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def predicate(self, name):
+        if name not in self.by_name:
+            raise RuntimeError, "Unknown predicate '{0}'".format(name)
+        return self.by_name[name]
+
+    def relations(self):
+        return [ predicate.table for predicate in self.predicates ]
+
+    def aggregated(self):
+        return [ predicate for predicate in self.predicates if predicate.aggregated ]
+
+def is_identifier(name):
+    return len(name) > 0 and name.replace("_", "").isalnum() and not name[0].isdigit()
+
+def load(path = DEFAULT_PATH):
+    with open(path, "r") as input:
+        try:
+            document = json.load(input)
+            entries = document["predicates"]
+            totals = document.get("totals")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise RuntimeError, "'{0}' is not a schema file".format(path)
+
+    predicates = []
+    for entry in entries:
+        name, table, columns = entry.get("name", ""), entry.get("table", ""), entry.get("columns", [])
+        if not name[:1].isupper() or not name.isalpha():
+            raise RuntimeError, "Invalid predicate name '{0}' in schema".format(name)
+        if not is_identifier(table):
+            raise RuntimeError, "Invalid table '{0}' for predicate '{1}' in schema".format(table, name)
+        if len(columns) == 0 or any(type not in TYPES for type in columns):
+            raise RuntimeError, "Invalid columns {0} for predicate '{1}' in schema".format(columns, name)
+        indexes = entry.get("indexes", [])
+        if any(len(index) == 0 or any(n not in range(len(columns)) for n in index) for index in indexes):
+            raise RuntimeError, "Invalid indexes {0} for predicate '{1}' in schema".format(indexes, name)
+        predicates.append(Predicate(str(name), str(table), map(str, columns), indexes, bool(entry.get("aggregated", False))))
+
+    if len(set(predicate.name for predicate in predicates)) != len(predicates) or \
+            len(set(predicate.table for predicate in predicates)) != len(predicates):
+        raise RuntimeError, "Predicates and tables must be unique in schema '{0}'".format(path)
+
+    if totals is not None:
+        by_name = dict((predicate.name, predicate) for predicate in predicates)
+        names = [ totals.get(role) for role in ("parts", "costs") ] if isinstance(totals, dict) else [ None ]
+        if not all(name in by_name and len(by_name[name]) >= 2 for name in names):
+            raise RuntimeError, "Invalid totals {0} in schema '{1}'".format(json.dumps(totals), path)
+        totals = tuple(by_name[name] for name in names)
+    return Schema(predicates, totals)
+
+SCHEMA = None
+
+# The schema of schema.json next to this module, loaded once.
+def default():
+    global SCHEMA
+    if SCHEMA is None:
+        SCHEMA = load()
+    return SCHEMA
+
+if __name__ == "__main__":
+    for predicate in load(*sys.argv[1:2]):
+        for query in predicate.make_create():
+            print query
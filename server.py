@@ -0,0 +1,255 @@
+#!/usr/bin/python
+################################################################################
+# Query server exposing the REPL pipeline over a local socket.
+#
+# The protocol is newline-delimited JSON. A client sends
+#   {"id": 1, "question": "how many dishes are there"}
+# and receives a structured answer:
+#   {"id": 1, "status": "ok", "semantics": "...", "sql": [...],
+#    "parameters": [...], "rows": [...],
+#    "timings": {"parse": ..., "build_trees": ..., "simplify": ..., ...},
+#    "counters": {"states": ..., "predictions": ..., ...}}
+# An ambiguous question is answered with its best scoring parse; "parses"
+# tells how many there were.
+# For a question which cannot be parsed "chunks" tells which parts of it were
+# understood.
+#
+# For type-ahead a client sends the text typed so far instead,
+#   {"id": 2, "prefix": "how many dishes"}
+# and receives the words which may follow it, and the lexicon categories
+# (such as nouns) whose words may:
+#   {"id": 2, "status": "ok", "expected": ["are", ...], "categories": [],
+#    "complete": false}
+# Every connection keeps its own incremental parse session, so consecutive
+# prefixes of the same question only parse the words which changed.
+#
+# The grammar and its lexicon are loaded once and shared by all connections,
+# as is the index of the entities of the database, which extends the lexicon
+# with the values inserted since. Every connection is read by a thread of its
+# own, and its requests are answered one at a time by a fixed pool of worker
+# threads, so a connection holds a worker only while a request of it is being
+# answered. Every worker reads through its own SQLite connection from the
+# connection pool (WAL mode, so readers do not block each other); writes are
+# serialized through the pool's single writer.
+
+import sys
+import json
+import argparse
+import threading
+import SocketServer
+from multiprocessing.pool import ThreadPool
+
+import earley
+import entity_index
+import lr
+import grammar_optimizer
+import logic_to_sql
+import answer_cache
+import counters
+import connection_pool
+import profiling
+import logic_ast_nodes
+import repl
+
+class QueryService(object):
+    def __init__(self, database = "example.db", grammar = "repl.txt", trace = None, optimize = True, lexicon = "repl.lex"):
+        self.trace = trace
+        self.pool = connection_pool.ConnectionPool(database)
+        self.grammar = repl.load_grammar(grammar, lexicon)
+        self.entities = entity_index.EntityIndex(normalizer = repl.NORMALIZER, new_category = "N/NEW")
+        self.entities.attach(self.grammar)
+        self.entities.load(self.pool, repl.SCHEMA)
+        self.optimizations = []
+        if optimize:
+            self.grammar, self.optimizations = grammar_optimizer.optimize(self.grammar)
+        self.parse_table = lr.ParseTable(self.grammar)
+
+        self.cache = answer_cache.AnswerCache()
+        self.cache_lock = threading.Lock()
+
+        self.counters = len(self.pool.read(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (counters.COUNTERS_TABLE,))) > 0
+
+    def _read(self, query, parameters, relations):
+        with self.cache_lock:
+            rows = self.cache.get(query, parameters)
+        if rows is None:
+            rows = self.pool.read(query, parameters)
+            with self.cache_lock:
+                self.cache.put(query, parameters, rows, relations)
+        return rows
+
+    def _write(self, query, parameters, relations):
+        rows = self.pool.write(query, parameters)
+        with self.cache_lock:
+            self.cache.invalidate(relations)
+        return rows
+
+    def answer(self, question):
+        profile = profiling.Profile(question)
+        response = self._answer(question, profile)
+        response["timings"] = profile.timings
+        response["counters"] = profile.counters
+        if self.trace is not None:
+            self.trace.write(profile)
+        return response
+
+    def _answer(self, question, profile):
+        response = { "question": question }
+
+        with profile.stage("normalize"):
+            tokens = repl.tokenize(question)
+        try:
+            variant, count = lr.parse_best_stream(self.parse_table, tokens, profile)
+        except earley.ParseError as e:
+            response["status"] = "unparsed"
+            response["error"] = str(e)
+            response["position"] = e.position
+            response["chunks"] = [
+                {
+                    "start": start,
+                    "end": end,
+                    "text": " ".join(tokens[start:end]),
+                    "tree": earley.qtree(tree) if tree is not None else None
+                }
+                for start, end, tree in earley.recover(self.grammar, e, tokens, profile) ]
+            return response
+
+        semantics, tree = variant
+        response["tree"] = earley.qtree(tree)
+        response["parses"] = count
+
+        try:
+            with profile.stage("simplify"):
+                semantics, reductions = logic_ast_nodes.simplify(semantics)
+            profile.count("beta_reductions", reductions)
+            response["semantics"] = str(semantics)
+
+            generator = logic_to_sql.SqlGenerator(use_counters = self.counters)
+            with profile.stage("sql"):
+                queries = list(generator.make_sql(semantics))
+
+            rows = []
+            with profile.stage("execute"):
+                for query, parameters in queries:
+                    if generator.type == "SELECT":
+                        rows.extend(self._read(query, parameters, generator.relations()))
+                    else:
+                        rows.extend(self._write(query, parameters, generator.relations()))
+            if generator.type == "INSERT":
+                for symbol in generator.symbols():
+                    self.entities.add(symbol)
+            profile.count("rows", len(rows))
+        except Exception as e:
+            response["status"] = "error"
+            response["error"] = str(e)
+            return response
+
+        response["status"] = "ok"
+        response["type"] = generator.type
+        response["sql"] = [ query for query, parameters in queries ]
+        response["parameters"] = [ list(parameters) for query, parameters in queries ]
+        response["rows"] = [ list(row) for row in rows ]
+        return response
+
+    def session(self):
+        return earley.ParseSession(self.grammar, tokenize = repl.tokenize)
+
+    def suggest(self, session, prefix):
+        profile = profiling.Profile(prefix)
+        with profile.stage("parse"):
+            reused = session.update(prefix)
+            expected = session.expected()
+            categories = session.expected_categories()
+            complete = len(session.parses(max_trees = 1)) > 0
+        profile.count("reused_columns", reused)
+        return {
+            "prefix": prefix,
+            "status": "ok",
+            "expected": sorted(expected),
+            "categories": sorted(categories),
+            "complete": complete,
+            "timings": profile.timings,
+            "counters": profile.counters
+        }
+
+class QueryHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        session = service.session()
+        for line in iter(self.rfile.readline, ""):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+                if "prefix" in request:
+                    method, arguments = service.suggest, (session, request["prefix"])
+                else:
+                    method, arguments = service.answer, (request["question"],)
+            except (ValueError, KeyError, TypeError) as e:
+                response = { "status": "error", "error": "Malformed request: {0}".format(e) }
+            else:
+                try:
+                    response = self.server.run(method, arguments)
+                except Exception as e:
+                    response = { "status": "error", "error": str(e) }
+                if "id" in request:
+                    response["id"] = request["id"]
+            self.wfile.write(json.dumps(response) + "\n")
+            self.wfile.flush()
+
+# Every connection is read by a thread of its own, which only waits for its
+# client; the requests it reads are answered one by one by a fixed pool of
+# worker threads. An idle connection therefore never holds a worker.
+class PooledMixIn(SocketServer.ThreadingMixIn):
+    daemon_threads = True
+    workers = 8
+
+    def run(self, method, arguments):
+        return self.pool.apply(method, arguments)
+
+class TCPQueryServer(PooledMixIn, SocketServer.TCPServer):
+    allow_reuse_address = True
+
+class UnixQueryServer(PooledMixIn, SocketServer.UnixStreamServer):
+    pass
+
+def make_server(service, tcp = None, unix = None, workers = PooledMixIn.workers):
+    if unix is not None:
+        server = UnixQueryServer(unix, QueryHandler)
+    else:
+        host, port = tcp
+        server = TCPQueryServer((host, port), QueryHandler)
+    server.service = service
+    server.workers = workers
+    server.pool = ThreadPool(workers)
+    return server
+
+def parse_address(string):
+    host, port = string.rsplit(":", 1)
+    return host, int(port)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Serves questions over newline-delimited JSON.")
+    parser.add_argument("--tcp", type = parse_address, default = ("127.0.0.1", 7777), metavar = "HOST:PORT")
+    parser.add_argument("--unix", metavar = "PATH")
+    parser.add_argument("--database", default = "example.db")
+    parser.add_argument("--grammar", default = "repl.txt")
+    parser.add_argument("--lexicon", default = "repl.lex")
+    parser.add_argument("--workers", type = int, default = PooledMixIn.workers)
+    parser.add_argument("--profile", metavar = "PATH", help = "append per-question traces as JSON lines")
+    parser.add_argument("--no-optimize", dest = "optimize", action = "store_false", help = "use the grammar as written")
+    args = parser.parse_args()
+
+    trace = profiling.TraceSink(args.profile) if args.profile else None
+    service = QueryService(args.database, args.grammar, trace, args.optimize, args.lexicon)
+    for line in service.optimizations:
+        print >>sys.stderr, "Grammar:", line
+    server = make_server(service, tcp = args.tcp, unix = args.unix, workers = args.workers)
+    print >>sys.stderr, "Serving on", args.unix or "%s:%d" % args.tcp
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,38 @@
+import unittest
+
+import answer_cache
+
+class AnswerCacheTest(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = answer_cache.AnswerCache()
+        self.assertEquals(None, cache.get("SELECT 1"))
+        cache.put("SELECT 1", (), [(1,)], ["my_is"])
+        self.assertEquals([(1,)], cache.get("SELECT 1"))
+        self.assertEquals(None, cache.get("SELECT 1", (2,)))
+        self.assertEquals(1, cache.hits)
+        self.assertEquals(2, cache.misses)
+
+    def test_invalidation_by_relation(self):
+        cache = answer_cache.AnswerCache()
+        cache.put("A", (), [], ["my_is"])
+        cache.put("B", (), [], ["my_consists"])
+        cache.put("C", (), [], ["my_is", "my_consists"])
+        cache.invalidate(["my_is"])
+        self.assertEquals(None, cache.get("A"))
+        self.assertEquals([], cache.get("B"))
+        self.assertEquals(None, cache.get("C"))
+        self.assertEquals(2, cache.invalidations)
+
+    def test_lru_eviction(self):
+        cache = answer_cache.AnswerCache(capacity = 2)
+        cache.put("A", (), [], ["my_is"])
+        cache.put("B", (), [], ["my_is"])
+        cache.get("A")
+        cache.put("C", (), [], ["my_is"])
+        self.assertEquals(2, len(cache))
+        self.assertEquals(None, cache.get("B"))
+        self.assertEquals([], cache.get("A"))
+        self.assertEquals(1, cache.evictions)
+
+if __name__ == '__main__':
+    unittest.main()
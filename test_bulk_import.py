@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import bulk_import
+import connection_pool
+import counters
+import earley
+import entity_index
+import logic_to_sql
+import repl
+
+class BulkImportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pool = connection_pool.ConnectionPool(os.path.join(self.directory, "test.db"))
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as output:
+            output.write(text)
+        return path
+
+    def test_load(self):
+        paths = [
+            self.write("facts.csv", "# dishes\nConsists,Pizza,Cheese\nConsists,Pizza,Tomato,200\n\nIs,Pizza,Vegetarian,\n"),
+            self.write("facts.jsonl", '["Have", "Tomato", 20]\n{"predicate": "Costs", "args": ["Tomato", "2.5"]}\n') ]
+        importer = bulk_import.Importer(self.pool, batch_size = 2)
+        statistics, seconds = importer.load(paths)
+        self.assertEquals({ "my_consists": 2, "my_is": 1, "my_have": 1, "my_costs": 1 }, statistics)
+        self.assertEquals([ ("Pizza", "Cheese", None), ("Pizza", "Tomato", 200) ],
+            self.pool.read("SELECT * FROM my_consists ORDER BY arg1"))
+        self.assertEquals([ ("Tomato", 2.5) ], self.pool.read("SELECT * FROM my_costs"))
+        indexes = [ row[0] for row in self.pool.read("SELECT name FROM sqlite_master WHERE type = 'index'") ]
+        self.assertTrue("my_consists_arg0_arg1" in indexes)
+        self.assertTrue(bulk_import.report(statistics, seconds).startswith("Imported 5 facts"))
+
+    def test_counters_are_rebuilt(self):
+        for predicate in repl.SCHEMA:
+            for query in predicate.make_create():
+                self.pool.write(query)
+        for query in counters.make_create_counters(repl.SCHEMA.aggregated(), repl.SCHEMA.totals):
+            self.pool.write(query)
+        self.pool.write("INSERT INTO my_is VALUES ('Salat', 'Vegetarian')")
+
+        path = self.write("facts.csv", "Is,Pizza,Vegetarian\nConsists,Pizza,Tomato\nCosts,Tomato,2\n")
+        bulk_import.Importer(self.pool, use_counters = True).load([ path ])
+        self.assertEquals(2, self.pool.read(counters.make_count_lookup("my_is", 1, "'Vegetarian'"))[0][0])
+        self.assertEquals(2, self.pool.read(counters.make_total_lookup("my_costs", "'Pizza'"))[0][0])
+        self.pool.write("INSERT INTO my_is VALUES ('Lasagna', 'Vegetarian')")
+        self.assertEquals(3, self.pool.read(counters.make_count_lookup("my_is", 1, "'Vegetarian'"))[0][0])
+
+    def test_only_loaded_counters_are_rebuilt(self):
+        for predicate in repl.SCHEMA:
+            for query in predicate.make_create():
+                self.pool.write(query)
+        self.pool.write("INSERT INTO my_have VALUES ('Tomato', 20)")
+        for query in counters.make_create_counters(repl.SCHEMA.aggregated(), repl.SCHEMA.totals):
+            self.pool.write(query)
+        # A count which would be corrected if my_have were counted again.
+        self.pool.write("UPDATE my_counters SET total = 5 WHERE relation = 'my_have'")
+
+        path = self.write("facts.csv", "Is,Pizza,Vegetarian\n")
+        bulk_import.Importer(self.pool, use_counters = True).load([ path ])
+        self.assertEquals(1, self.pool.read(counters.make_count_lookup("my_is", 1, "'Vegetarian'"))[0][0])
+        self.assertEquals(5, self.pool.read(counters.make_count_lookup("my_have", 0, "'Tomato'"))[0][0])
+
+        path = self.write("facts.csv", "Is,Lasagna,Vegetarian\nHates,Pizza,Cheese\n")
+        self.assertRaises(RuntimeError, bulk_import.Importer(self.pool, use_counters = True).load, [ path ])
+        self.assertEquals(1, self.pool.read(counters.make_count_lookup("my_is", 1, "'Vegetarian'"))[0][0])
+        self.assertEquals(1, self.pool.read("SELECT COUNT(*) FROM my_is")[0][0])
+
+    def test_invalid_facts(self):
+        for name, text in [
+                ("facts.csv", "Consists,Pizza,Cheese\nHates,Pizza,Cheese\n"),
+                ("facts.csv", "Consists,Pizza,Cheese,200,300\n"),
+                ("facts.csv", "Consists,Pizza,Olive-oil\n"),
+                ("facts.csv", "Have,Tomato,twenty\n"),
+                ("facts.jsonl", '["Have", 20, 20]\n'),
+                ("facts.jsonl", '["Have", "Tomato"\n'),
+                ("facts.txt", "Consists,Pizza,Cheese\n") ]:
+            self.assertRaises(RuntimeError, bulk_import.Importer(self.pool).load, [ self.write(name, text) ])
+        self.assertRaises(RuntimeError, bulk_import.Importer(self.pool).load, [ os.path.join(self.directory, "none.csv") ])
+        self.assertEquals([], self.pool.read("SELECT name FROM sqlite_master WHERE type = 'table'"))
+
+    def test_facts_are_symbols(self):
+        path = self.write("facts.csv", "Consists,pizza,OLIVE\nConsists,Pizza,olive oil\n")
+        bulk_import.Importer(self.pool).load([ path ])
+        self.assertEquals([ ("Pizza", "Olive"), ("Pizza", "Oliveoil") ], self.pool.read("SELECT arg0, arg1 FROM my_consists"))
+
+        grammar = repl.load_grammar()
+        entities = entity_index.EntityIndex(normalizer = repl.NORMALIZER)
+        entities.attach(grammar)
+        entities.load(self.pool, repl.SCHEMA)
+        semantics = earley.parse_stream(grammar, repl.tokenize("what does pizza consist of"))[0][0].simplify()
+        (query, parameters), = logic_to_sql.SqlGenerator().make_sql(semantics)
+        self.assertEquals([ ("Olive",), ("Oliveoil",) ], self.pool.read(query, parameters))
+
+if __name__ == '__main__':
+    unittest.main()
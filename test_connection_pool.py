@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import connection_pool
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pool = connection_pool.ConnectionPool(os.path.join(self.directory, "test.db"))
+        self.pool.write("CREATE TABLE my_is(arg0 TEXT, arg1 TEXT)")
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_wal_mode(self):
+        self.assertEquals("wal", self.pool.read("PRAGMA journal_mode")[0][0])
+
+    def test_readers_are_per_thread_and_read_only(self):
+        readers = []
+        thread = threading.Thread(target = lambda: readers.append(self.pool.reader()))
+        thread.start()
+        thread.join()
+        self.assertFalse(readers[0] is self.pool.reader())
+        self.assertRaises(Exception, self.pool.read, "INSERT INTO my_is VALUES ('Pizza', 'Vegetarian')")
+
+    def test_concurrent_reads_and_writes(self):
+        errors = []
+
+        def read():
+            try:
+                for n in range(200):
+                    self.pool.read("SELECT COUNT(*) FROM my_is")
+            except Exception as e:
+                errors.append(e)
+
+        def write():
+            try:
+                for n in range(200):
+                    self.pool.execute("INSERT INTO my_is VALUES (?, 'Vegetarian')", ("Dish%d" % n,))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [ threading.Thread(target = read) for n in range(4) ] + [ threading.Thread(target = write) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals([], errors)
+        self.assertEquals(200, self.pool.read("SELECT COUNT(*) FROM my_is")[0][0])
+
+    def test_transaction(self):
+        def load():
+            with self.pool.transaction() as connection:
+                connection.execute("CREATE TABLE my_have(arg0 TEXT, arg1 NUMBER)")
+                connection.execute("INSERT INTO my_is VALUES ('Pizza', 'Vegetarian')")
+                raise RuntimeError, "invalid fact"
+        self.assertRaises(RuntimeError, load)
+        self.assertEquals([ ("my_is",) ], self.pool.read("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        self.assertEquals(0, self.pool.read("SELECT COUNT(*) FROM my_is")[0][0])
+
+        with self.pool.transaction() as connection:
+            connection.execute("CREATE TABLE my_have(arg0 TEXT, arg1 NUMBER)")
+            connection.execute("INSERT INTO my_is VALUES ('Pizza', 'Vegetarian')")
+        self.assertEquals(1, self.pool.read("SELECT COUNT(*) FROM my_is")[0][0])
+        self.pool.write("INSERT INTO my_have VALUES ('Tomato', 20)")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import sqlite3
+
+import counters
+import earley
+import logic_to_sql
+import repl
+import schema
+
+CONSISTS = schema.Predicate("Consists", "my_consists", [ "TEXT", "TEXT" ])
+COSTS = schema.Predicate("Costs", "my_costs", [ "TEXT", "NUMBER" ])
+TOTALS = (CONSISTS, COSTS)
+
+class CountersTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("CREATE TABLE my_consists(arg0 TEXT, arg1 TEXT)")
+        self.connection.execute("INSERT INTO my_consists VALUES ('Pizza', 'Cheese')")
+
+    def scalar(self, query):
+        return self.connection.execute(query).fetchone()[0]
+
+    def test_counters_follow_inserts_and_deletes(self):
+        for query in counters.make_create_counters([ CONSISTS ]):
+            self.connection.execute(query)
+
+        self.connection.execute("INSERT INTO my_consists VALUES ('Pizza', 'Tomato')")
+        self.connection.execute("INSERT INTO my_consists VALUES ('Lasagna', 'Cheese')")
+
+        self.assertEquals(2, self.scalar(counters.make_count_lookup("my_consists", 1, "'Cheese'")))
+        self.assertEquals(2, self.scalar(counters.make_count_lookup("my_consists", 0, "'Pizza'")))
+        self.assertEquals(0, self.scalar(counters.make_count_lookup("my_consists", 1, "'Salat'")))
+        self.assertEquals(2, self.scalar(counters.make_distinct_count_lookup("my_consists", 0)))
+
+        self.connection.execute("DELETE FROM my_consists WHERE arg0 = 'Lasagna'")
+
+        self.assertEquals(1, self.scalar(counters.make_count_lookup("my_consists", 1, "'Cheese'")))
+        self.assertEquals(1, self.scalar(counters.make_distinct_count_lookup("my_consists", 0)))
+
+    def test_totals_follow_inserts_and_deletes(self):
+        self.connection.execute("CREATE TABLE my_costs(arg0 TEXT, arg1 NUMBER)")
+        self.connection.execute("INSERT INTO my_costs VALUES ('Cheese', 3)")
+        for query in counters.make_create_counters(TOTALS, TOTALS):
+            self.connection.execute(query)
+        self.assertEquals(3, self.scalar(counters.make_total_lookup("my_costs", "'Pizza'")))
+
+        self.connection.execute("INSERT INTO my_consists VALUES ('Pizza', 'Tomato')")
+        self.connection.execute("INSERT INTO my_consists VALUES ('Lasagna', 'Cheese')")
+        self.connection.execute("INSERT INTO my_costs VALUES ('Tomato', 2)")
+        self.assertEquals(5, self.scalar(counters.make_total_lookup("my_costs", "'Pizza'")))
+        self.assertEquals(3, self.scalar(counters.make_total_lookup("my_costs", "'Lasagna'")))
+
+        self.connection.execute("DELETE FROM my_costs WHERE arg0 = 'Cheese'")
+        self.connection.execute("DELETE FROM my_consists WHERE arg1 = 'Tomato'")
+        self.assertEquals(0, self.scalar(counters.make_total_lookup("my_costs", "'Pizza'")))
+        self.assertEquals(0, self.scalar(counters.make_total_lookup("my_costs", "'Salat'")))
+
+    def test_sum_of_costs(self):
+        self.connection.execute("CREATE TABLE my_costs(arg0 TEXT, arg1 NUMBER)")
+        self.connection.execute("INSERT INTO my_consists VALUES ('Pizza', 'Tomato')")
+        self.connection.execute("INSERT INTO my_costs VALUES ('Cheese', 3)")
+        self.connection.execute("INSERT INTO my_costs VALUES ('Tomato', 2)")
+        grammar = repl.load_grammar()
+        def answer(question, use_counters):
+            semantics = earley.parse_stream(grammar, repl.tokenize(question))[0][0].simplify()
+            (query, parameters), = logic_to_sql.SqlGenerator(use_counters = use_counters).make_sql(semantics)
+            return query, self.connection.execute(query, parameters).fetchone()[0]
+
+        # Ingredients cost as much as they do themselves, dishes without
+        # costs nothing, whether totals are materialized or not.
+        for use_counters in [ False, True ]:
+            if use_counters:
+                for query in counters.make_create_counters(TOTALS, TOTALS):
+                    self.connection.execute(query)
+            for question, total in [ ("how much is pizza", 5), ("how much is tomato", 2), ("how much is salat", 0) ]:
+                self.assertEquals(total, answer(question, use_counters)[1])
+        self.assertEquals(counters.make_total_lookup("my_costs", "'Pizza'"), answer("how much is pizza", True)[0])
+
+    def test_drop_counters(self):
+        self.connection.execute("CREATE TABLE my_costs(arg0 TEXT, arg1 NUMBER)")
+        for query in counters.make_create_counters(TOTALS, TOTALS):
+            self.connection.execute(query)
+        for query in counters.make_drop_counters(TOTALS):
+            self.connection.execute(query)
+        self.assertEquals(0, self.scalar("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'my_counters%' OR name LIKE 'my_distinct%' OR name LIKE 'my_totals%'"))
+
+if __name__ == '__main__':
+    unittest.main()
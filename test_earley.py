@@ -0,0 +1,265 @@
+import unittest
+
+import earley
+import profiling
+import repl
+
+def load_repl_grammar():
+    return repl.load_grammar()
+
+# The REPL grammar is written for normalized tokens.
+def normalize(text):
+    return " ".join(repl.tokenize(text))
+
+class EarleyTest(unittest.TestCase):
+    def setUp(self):
+        self.grammar = load_repl_grammar()
+
+    def test_parse(self):
+        variants = earley.parse(self.grammar, normalize("pizza consists of cheese"))
+        self.assertEquals(1, len(variants))
+        semantics, tree = variants[0]
+        self.assertEquals("Consists(Pizza,Cheese)", str(semantics.simplify()))
+        self.assertEquals(
+            "[S [NP [N pizza]] [VP [V/CONSIST consist] [PP [P of] [NP [N cheese]]]]]",
+            earley.qtree(tree))
+
+    def test_parse_failure(self):
+        self.assertEquals([], earley.parse(self.grammar, normalize("pizza consists cheese of")))
+
+    def test_profile(self):
+        profile = profiling.Profile("how many dishes are there")
+        earley.parse(self.grammar, normalize("how many dishes are there"), profile)
+        self.assertEquals([ "parse", "build_trees" ], profile.timings.keys())
+        self.assertEquals(1, profile.counters["trees"])
+        self.assertTrue(profile.counters["states"] > 0)
+        self.assertTrue(profile.counters["predictions"] > 0)
+
+    def test_lookahead_prunes_chart(self):
+        for question in [ "how many dishes are there", "is pizza kosher", "pizza takes an hour" ]:
+            before = profiling.Profile()
+            after = profiling.Profile()
+            expected = earley.parse(self.grammar, normalize(question), before, lookahead = False)
+            actual = earley.parse(self.grammar, normalize(question), after, lookahead = True)
+            self.assertEquals(
+                [ (str(s), earley.qtree(t)) for s, t in expected ],
+                [ (str(s), earley.qtree(t)) for s, t in actual ])
+            self.assertTrue(after.counters["states"] < before.counters["states"])
+
+    def test_first_sets(self):
+        A = earley.Rule("A", earley.Production(None, ("a", None)), earley.Production(None))
+        B = earley.Rule("B", earley.Production(None, (A, None), ("b", None)))
+        earley.compute_first_sets([ A, B ])
+        self.assertTrue(A.nullable)
+        self.assertFalse(B.nullable)
+        self.assertEquals(set([ "a", "b" ]), B.first)
+
+    def test_nullable_rules(self):
+        grammar = earley.load_grammar([
+            "S::(B)(A) -> NP:=A VP:=B",
+            "NP::(A) -> D/OPT N:=A",
+            "VP::(\\x.Likes(x,A)) -> likes NP:=A",
+            "D/OPT -> D",
+            "D/OPT ->",
+            "D -> a",
+            "N::John -> john",
+            "N::Mary -> mary" ])
+        for question in [ "john likes mary", "a john likes a mary" ]:
+            variants = earley.parse(grammar, question)
+            self.assertEquals(1, len(variants))
+            self.assertEquals("Likes(John,Mary)", str(variants[0][0].simplify()))
+
+    def test_nullable_rule_predicted_after_its_completion(self):
+        # Y is predicted only after the empty X has already been completed
+        # in column 0, so Y -> X c has to be advanced over X on prediction.
+        grammar = earley.load_grammar([
+            "S -> X Y",
+            "Y -> X c",
+            "X ->" ])
+        self.assertEquals(1, len(earley.parse(grammar, "c")))
+        self.assertEquals(0, len(earley.parse(grammar, "c c")))
+
+    def test_leo_items(self):
+        grammar = earley.load_grammar([
+            "S::(A) -> L:=A",
+            "L::(\\x.Item(x)) -> item",
+            "L::(\\x.Item(x)&&B(x)) -> item AND L:=B",
+            "AND -> and" ])
+        text = " and ".join([ "item" ] * 20)
+        without_leo = profiling.Profile()
+        with_leo = profiling.Profile()
+        expected = earley.parse(grammar, text, without_leo, leo = False)
+        actual = earley.parse(grammar, text, with_leo, leo = True)
+        self.assertEquals(
+            [ (str(s), earley.qtree(t)) for s, t in expected ],
+            [ (str(s), earley.qtree(t)) for s, t in actual ])
+        self.assertTrue(with_leo.counters["states"] < without_leo.counters["states"] / 2)
+
+    def test_leo_items_keep_ambiguity(self):
+        for question in [ "does pizza consists of cheese and tomato and cheese", "what does pizza and lasagna consist of" ]:
+            expected = earley.parse(self.grammar, normalize(question), leo = False)
+            actual = earley.parse(self.grammar, normalize(question), leo = True)
+            self.assertEquals(
+                sorted((str(s.simplify()), earley.qtree(t)) for s, t in expected),
+                sorted((str(s.simplify()), earley.qtree(t)) for s, t in actual))
+
+    def test_session_matches_parse(self):
+        session = earley.ParseSession(self.grammar, tokenize = repl.tokenize)
+        for question in [ "pizza consists of cheese", "how many dishes are there", "pizza consists cheese of" ]:
+            session.update(question)
+            self.assertEquals(
+                [ (str(s), earley.qtree(t)) for s, t in earley.parse(self.grammar, normalize(question)) ],
+                [ (str(s), earley.qtree(t)) for s, t in session.parses() ])
+
+    def test_session_reuses_prefix(self):
+        session = earley.ParseSession(self.grammar, tokenize = repl.tokenize)
+        self.assertEquals(0, session.update("pizza consists"))
+        self.assertEquals(2, session.update("pizza consists of cheese"))
+        self.assertEquals(1, session.update("pizza takes an hour"))
+        self.assertEquals(4, len(session.table))
+        self.assertEquals(1, len(session.parses()))
+
+    def test_session_expected(self):
+        session = earley.ParseSession(self.grammar, tokenize = repl.tokenize)
+        session.update("pizza")
+        self.assertEquals(set([ "and", "consist", "cost", "have", "is", "take" ]), session.expected())
+        self.assertEquals([], session.parses())
+        session.update("pizza consists of")
+        self.assertFalse("cheese" in session.expected())
+        self.assertEquals(set([ "N", "NUM" ]), session.expected_categories())
+        self.assertFalse("of" in session.expected())
+        session.update("of of")
+        self.assertEquals(set(), session.expected())
+
+    def test_phrases(self):
+        grammar = earley.load_grammar([
+            "S::(B)(A) -> Q:=A NP:=B",
+            "Q::Many -> how many",
+            "Q::Much -> how much",
+            "NP::(\\x.Dishes(x)) -> dishes" ])
+        self.assertEquals([ earley.Phrase([ "how", "many" ]) ], list(grammar.productions[0][0].productions[0]))
+        self.assertEquals(set([ "how" ]), grammar.first)
+        variants = earley.parse(grammar, "how much dishes")
+        self.assertEquals("Dishes(Much)", str(variants[0][0].simplify()))
+        self.assertEquals("[S [Q how much] [NP dishes]]", earley.qtree(variants[0][1]))
+        self.assertEquals([], earley.parse(grammar, "how dishes"))
+        self.assertEquals([], earley.parse(grammar, "how"))
+
+        session = earley.ParseSession(grammar)
+        session.update("how")
+        self.assertEquals(set([ "many", "much" ]), session.expected())
+
+    def test_parse_stream_fails_fast(self):
+        consumed = []
+        def tokens():
+            for token in [ "pizza", "of", "cheese", "consists" ]:
+                consumed.append(token)
+                yield token
+        try:
+            earley.parse_stream(self.grammar, tokens())
+            self.fail()
+        except earley.ParseError as e:
+            self.assertEquals(1, e.position)
+            self.assertEquals("of", e.token)
+        self.assertEquals([ "pizza", "of" ], consumed)
+
+    def test_parse_stream_end_of_input(self):
+        try:
+            earley.parse_stream(self.grammar, [ "how", "many" ])
+            self.fail()
+        except earley.ParseError as e:
+            self.assertEquals(2, e.position)
+            self.assertEquals(None, e.token)
+
+    def test_itokenize(self):
+        self.assertEquals(
+            [ "pizza", "consists", "of", "cheese" ],
+            list(earley.itokenize([ "Pizza cons", "ists of", " ", "cheese" ])))
+        variants = earley.parse_stream(self.grammar, earley.itokenize([ "pizza consist ", "of cheese\n" ]))
+        self.assertEquals("Consists(Pizza,Cheese)", str(variants[0][0].simplify()))
+
+    def test_max_trees(self):
+        question = "what does pizza and pizza and pizza and pizza consist of"
+        variants = earley.parse(self.grammar, normalize(question))
+        self.assertEquals(5, len(variants))
+        profile = profiling.Profile()
+        limited = earley.parse(self.grammar, normalize(question), profile, max_trees = 2)
+        self.assertEquals(2, len(set(earley.qtree(t) for s, t in limited)))
+        self.assertTrue(set(earley.qtree(t) for s, t in limited) <= set(earley.qtree(t) for s, t in variants))
+        self.assertEquals(2, profile.counters["trees"])
+
+    def test_parse_first(self):
+        variant, ambiguous = earley.parse_first(self.grammar, normalize("what does pizza and pizza and pizza consist of"))
+        self.assertTrue(ambiguous)
+        variant, ambiguous = earley.parse_first(self.grammar, normalize("pizza consists of cheese"))
+        self.assertEquals("Consists(Pizza,Cheese)", str(variant[0].simplify()))
+        self.assertFalse(ambiguous)
+        self.assertEquals((None, False), earley.parse_first(self.grammar, "pizza of"))
+
+    def test_parse_best_counts_trees(self):
+        for n in range(2, 7):
+            question = "what does %s consist of" % " and ".join([ "pizza" ] * n)
+            variants = earley.parse(self.grammar, normalize(question))
+            variant, count = earley.parse_best(self.grammar, normalize(question))
+            self.assertEquals(len(variants), count)
+            self.assertTrue(earley.qtree(variant[1]) in [ earley.qtree(t) for s, t in variants ])
+        self.assertEquals((None, 0), earley.parse_best(self.grammar, "pizza of"))
+
+    def test_parse_best_prefers_heavier_derivation(self):
+        for weight, expected in [ ("@0.5", "Johnmary"), ("@2", "Pair(John,Mary)") ]:
+            grammar = earley.load_grammar([
+                "S::(A) -> NP:=A",
+                "NP::Pair(A,B) -> NP:=A NP:=B " + weight,
+                "NP::Johnmary -> john mary",
+                "NP::John -> john",
+                "NP::Mary -> mary" ])
+            variant, count = earley.parse_best(grammar, "john mary")
+            self.assertEquals(2, count)
+            self.assertEquals(expected, str(variant[0].simplify()))
+
+    def recover(self, question):
+        tokens = repl.tokenize(question)
+        try:
+            earley.parse_stream(self.grammar, tokens)
+            self.fail()
+        except earley.ParseError as e:
+            return [ (" ".join(tokens[start:end]), earley.qtree(tree) if tree else None)
+                for start, end, tree in earley.recover(self.grammar, e, tokens) ]
+
+    def test_recover(self):
+        self.assertEquals(
+            [ ("foo", None), ("pizza is vegetarian", "[S [NP [N pizza]] [VP [V/TRANS is] [NP [N vegetarian]]]]") ],
+            self.recover("foo pizza is vegetarian"))
+        self.assertEquals(
+            [ ("pizza", "[NP [N pizza]]"), ("of cheese", "[PP [P of] [NP [N cheese]]]") ],
+            self.recover("pizza of cheese"))
+        self.assertEquals(
+            [ ("how many", "[NPWH/CNT how many]") ],
+            self.recover("how many"))
+
+    def test_load_grammar(self):
+        grammar = earley.load_grammar([
+            "S::(B)(A) -> NP:=A VP:=B @0.5",
+            "NP::John -> john",
+            "VP::(\\x.Sleeps(x)) -> sleeps" ])
+        production = grammar.productions[0]
+        self.assertEquals(0.5, production.weight)
+        self.assertEquals([ "NP", "VP" ], [ term.name for term in production ])
+        self.assertEquals([ "A", "B" ], [ variable for term, variable in production.terms ])
+        self.assertEquals("Sleeps(John)", str(earley.parse(grammar, "john sleeps")[0][0].simplify()))
+
+        for line, message in [
+            ("S -> Ab", "Unable to determine whether term 'Ab'"),
+            ("S -> A:x", "Invalid semantic expression for term 'A'"),
+            ("S::(( -> a", "Unable to parse semantic expression for term 'S'"),
+            ("S::X -> B::Y", "Semantics for right-hand shide should be only variable bindings"),
+            ("a -> b", "Left-hand side have to be a non-terminal"),
+            ("S a", "Second part should be either '->' or '!->'") ]:
+            try:
+                earley.load_grammar([ line ])
+                self.fail()
+            except RuntimeError as e:
+                self.assertTrue(message in str(e), str(e))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import connection_pool
+import earley
+import entity_index
+import lr
+import repl
+
+class EntityIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pool = connection_pool.ConnectionPool(os.path.join(self.directory, "test.db"))
+        self.pool.write("CREATE TABLE my_consists(arg0 TEXT, arg1 TEXT)")
+        self.pool.write("CREATE TABLE my_have(arg0 TEXT, arg1 NUMBER)")
+        self.pool.write("INSERT INTO my_consists VALUES ('Pasta', 'Cheese')")
+        self.pool.write("INSERT INTO my_consists VALUES ('Pizza', 'Olive oil')")
+        self.pool.write("INSERT INTO my_have VALUES ('Basil', 5)")
+
+        self.grammar = repl.load_grammar()
+        self.entities = entity_index.EntityIndex()
+        self.entities.attach(self.grammar)
+        self.entities.load(self.pool, repl.SCHEMA)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_load(self):
+        self.assertEquals(set([ "pasta", "cheese", "pizza", "basil" ]), set(self.entities.entities))
+
+    def test_unknown_words(self):
+        variants = earley.parse_stream(self.grammar, repl.tokenize("what does pasta consist of"))
+        self.assertEquals(1, len(variants))
+        self.assertTrue("[NP [N pasta]]" in earley.qtree(variants[0][1]))
+        semantics, tree = lr.ParseTable(self.grammar).parse(repl.tokenize("pasta consists of basil"))
+        self.assertEquals("Consists(Pasta,Basil)", str(semantics.simplify()))
+
+    def test_known_words_are_not_ambiguous(self):
+        self.assertEquals(1, len(earley.parse_stream(self.grammar, repl.tokenize("pizza consists of cheese"))))
+
+    def test_add(self):
+        self.assertEquals([], earley.parse(self.grammar, "is pesto vegetarian"))
+        self.entities.add("Pesto")
+        self.assertEquals("(\\z.Is(Pesto,Vegetarian))", str(earley.parse(self.grammar, "is pesto vegetarian")[0][0].simplify()))
+        self.entities.clear()
+        self.assertEquals([], earley.parse(self.grammar, "is pesto vegetarian"))
+
+    def test_new_words(self):
+        grammar = repl.load_grammar()
+        entities = entity_index.EntityIndex(normalizer = repl.NORMALIZER, new_category = "N/NEW")
+        entities.attach(grammar)
+        table = lr.ParseTable(grammar)
+        semantics, tree = table.parse(repl.tokenize("lasagne consists of cheese"))
+        self.assertEquals("Consists(Lasagne,Cheese)", str(semantics.simplify()))
+        semantics, tree = table.parse(repl.tokenize("pizza consists of pesto"))
+        self.assertEquals("Consists(Pizza,Pesto)", str(semantics.simplify()))
+        self.assertEquals((), entities.productions("how", "N/NEW"))
+
+        # Only statements introduce entities; questions and misspelled
+        # statements do not parse.
+        self.assertRaises(earley.ParseError, earley.parse_stream, grammar, repl.tokenize("what does lasagne consist of"))
+        self.assertRaises(earley.ParseError, earley.parse_stream, grammar, repl.tokenize("how many dishes consist of pesto"))
+        self.assertRaises(earley.ParseError, earley.parse_stream, grammar, repl.tokenize("does pizza consist of pesto"))
+        self.assertRaises(earley.ParseError, earley.parse_stream, grammar, repl.tokenize("pizza consits of cheese"))
+        self.assertEquals([], earley.parse(grammar, "is pesto vegetarian how"))
+
+if __name__ == '__main__':
+    unittest.main()
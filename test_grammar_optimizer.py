@@ -0,0 +1,59 @@
+import unittest
+
+import earley
+import entity_index
+import grammar_optimizer
+import repl
+
+class GrammarOptimizerTest(unittest.TestCase):
+    def test_scenario_semantics_unchanged(self):
+        grammar = repl.load_grammar()
+        entities = entity_index.EntityIndex()
+        entities.attach(grammar)
+        entities.add("Pasta")
+        optimized, report = grammar_optimizer.optimize(grammar)
+        self.assertTrue(len(report) > 0)
+
+        questions = [ line.strip() for line in open("scenario.txt", "r") ]
+        questions = [ line for line in questions if line and not line.startswith(".") ]
+        questions += [ "what does pizza and lasagna consist of" ]
+        for question in questions:
+            tokens = " ".join(repl.tokenize(question))
+            expected = sorted(str(semantics) for semantics, tree in earley.parse(grammar, tokens))
+            self.assertTrue(len(expected) > 0, question)
+            self.assertEquals(expected, sorted(str(semantics) for semantics, tree in earley.parse(optimized, tokens)))
+        self.assertEquals([], earley.parse(optimized, "pizza of cheese"))
+
+    def test_optimize(self):
+        rules = {}
+        grammar = earley.load_grammar([
+            "S::(B)(A) -> NP:=A VP:=B",
+            "NP::(A) -> N:=A",
+            "NP::(A) -> N:=A",
+            "VP::(\\x.Likes(x,A)) -> likes NP:=A",
+            "VP::(\\x.Hates(x,A)) -> hates X:=A",
+            "N::John -> john",
+            "N::Mary -> mary",
+            "X::(A) -> X:=A",
+            "Y -> y" ], rules)
+        optimized, report = grammar_optimizer.optimize(grammar, rules.values())
+
+        self.assertEquals(set([ "S", "NP", "VP" ]), set(rule.name for rule in earley.get_rules(optimized)))
+        self.assertTrue("removed unproductive rule X" in report)
+        self.assertTrue("removed unreachable rule Y" in report)
+        self.assertTrue("removed unreachable rule N" in report)
+        self.assertEquals(1, sum(1 for line in report if line.startswith("removed production VP")))
+        self.assertEquals(1, sum(1 for line in report if line.startswith("collapsed unit production NP")))
+        self.assertEquals(1, sum(1 for line in report if line.startswith("merged duplicate production NP")))
+
+        # NP -> N is replaced by the two productions of N.
+        np = [ rule for rule in earley.get_rules(optimized) if rule.name == "NP" ][0]
+        self.assertEquals(2, len(np.productions))
+
+        variants = earley.parse(optimized, "john likes mary")
+        self.assertEquals(1, len(variants))
+        self.assertEquals("Likes(John,Mary)", str(variants[0][0].simplify()))
+        self.assertEquals("[S [NP john] [VP likes [NP mary]]]", earley.qtree(variants[0][1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import earley
+import lexicon
+import lr
+
+class LexiconTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.lex")
+        lexicon.write(self.path, [
+            ("mary", "N", "Mary"),
+            ("john", "N", "John"),
+            ("jo", "N", "Jo"),
+            ("johnny", "N", "John"),
+            ("like", "V", "\\y.\\x.Likes(x,y)"),
+            ("likes", "V", "\\y.\\x.Likes(x,y)"),
+            ("people", "N", ""),
+            ("mary jane", "N", "Maryjane"),
+            ("mary jane watson", "N", "Mj"),
+            ("peter parker", "N", "Spiderman") ])
+        self.lexicon = lexicon.Lexicon(self.path)
+
+    def tearDown(self):
+        self.lexicon.close()
+        shutil.rmtree(self.directory)
+
+    def load_grammar(self, lines):
+        grammar = earley.load_grammar(lines)
+        lexicon.attach(self.lexicon, grammar)
+        return grammar
+
+    def test_lookup(self):
+        self.assertEquals([ "N", "V" ], self.lexicon.categories)
+        for word, category, semantics in [ ("jo", "N", "Jo"), ("john", "N", "John"), ("johnny", "N", "John"),
+                ("mary", "N", "Mary"), ("likes", "V", "\\y.\\x.Likes(x,y)"), ("people", "N", "") ]:
+            self.assertEquals([ (category, semantics) ], self.lexicon.lookup(word))
+        for word in [ "a", "j", "joh", "johnnyx", "zzz", "mary jan" ]:
+            self.assertEquals([], self.lexicon.lookup(word))
+        self.assertEquals([ ("N", "Maryjane") ], self.lexicon.lookup("mary jane"))
+        self.assertTrue(self.lexicon.continues("mary"))
+        self.assertTrue(self.lexicon.continues("mary jane"))
+        self.assertFalse(self.lexicon.continues("mary jane watson"))
+        self.assertFalse(self.lexicon.continues("john"))
+        self.assertTrue(self.lexicon.continues("mary", "N"))
+        self.assertFalse(self.lexicon.continues("mary", "V"))
+        self.assertFalse(self.lexicon.continues("peter", "V"))
+
+    def test_parse(self):
+        grammar = self.load_grammar([
+            "S::(B)(A) -> N:=A VP:=B",
+            "VP::(A)(B) -> V:=A N:=B",
+            "N::Nobody -> nobody" ])
+        variants = earley.parse(grammar, "johnny likes mary")
+        self.assertEquals(1, len(variants))
+        self.assertEquals("Likes(John,Mary)", str(variants[0][0].simplify()))
+        self.assertEquals("[S [N johnny] [VP [V likes] [N mary]]]", earley.qtree(variants[0][1]))
+        self.assertEquals("Likes(Nobody,Jo)", str(earley.parse(grammar, "nobody likes jo")[0][0].simplify()))
+        self.assertEquals([], earley.parse(grammar, "mary likes likes"))
+
+        table = lr.ParseTable(grammar)
+        semantics, tree = table.parse(earley.tokenize("johnny likes mary"))
+        self.assertEquals("Likes(John,Mary)", str(semantics.simplify()))
+        self.assertEquals("[S [N johnny] [VP [V likes] [N mary]]]", earley.qtree(tree))
+
+    def test_multi_word_entries(self):
+        grammar = self.load_grammar([
+            "S::(B)(A) -> N:=A VP:=B",
+            "VP::(A)(B) -> V:=A N:=B" ])
+        table = lr.ParseTable(grammar)
+        for question, expected in [
+                ("mary jane likes mary", "Likes(Maryjane,Mary)"),
+                ("mary likes mary jane watson", "Likes(Mary,Mj)"),
+                ("peter parker likes john", "Likes(Spiderman,John)") ]:
+            variants = earley.parse(grammar, question)
+            self.assertEquals([ expected ], [ str(semantics.simplify()) for semantics, tree in variants ])
+            (semantics, tree), count = lr.parse_best_stream(table, earley.tokenize(question))
+            self.assertEquals(expected, str(semantics.simplify()))
+            self.assertEquals(earley.qtree(variants[0][1]), earley.qtree(tree))
+        # Entries which start with the same word are left to the Earley parser.
+        self.assertRaises(lr.Conflict, table.parse, earley.tokenize("mary jane likes mary"))
+        self.assertEquals("Likes(Spiderman,John)", str(table.parse(earley.tokenize("peter parker likes john"))[0].simplify()))
+        self.assertEquals("[S [N mary jane] [VP [V likes] [N john]]]",
+            earley.qtree(earley.parse(grammar, "mary jane likes john")[0][1]))
+        self.assertEquals([], earley.parse(grammar, "mary likes mary jane watson watson"))
+
+    def test_ambiguous_entries(self):
+        path = os.path.join(self.directory, "ambiguous.lex")
+        lexicon.write(path, [ ("john", "N", "John"), ("john", "N", "Johnson") ])
+        self.lexicon.close()
+        self.lexicon = lexicon.Lexicon(path)
+        grammar = self.load_grammar([ "S::(A) -> N:=A" ])
+        self.assertEquals(
+            set([ "John", "Johnson" ]),
+            set(str(semantics.simplify()) for semantics, tree in earley.parse(grammar, "john")))
+        table = lr.ParseTable(grammar)
+        self.assertRaises(lr.Conflict, table.parse, [ "john" ])
+        self.assertEquals(2, lr.parse_best_stream(table, [ "john" ])[1])
+
+    def test_write_checks_entries(self):
+        for entry in [ ("John", "N", "John"), ("john", "n", "John"), ("john", "N", "((") ]:
+            self.assertRaises(RuntimeError, lexicon.write, self.path, [ entry ])
+
+if __name__ == '__main__':
+    unittest.main()
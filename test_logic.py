@@ -1,4 +1,5 @@
 import unittest
+import threading
 
 import logic
 import logic_ast_nodes as nodes
@@ -78,5 +79,15 @@ class LogicTest(unittest.TestCase):
         test(r"(\P.P)((\x.(\y.Likes(y,x)))(Mary))", r"(\y.Likes(y,Mary))")
         test(r"(\P.P)(\x.(\x.(\y.Likes(y,x)))(Mary)(x) && (\x.(\y.Hates(y,x)))(John)(x))", r"(\x.Likes(x,Mary)&&Hates(x,John)))")
 
+    def test_reductions(self):
+        x = logic.parse_logic_expression(r"(\x.\y.Likes(x,y))(John)(Mary)")
+        results = []
+        thread = threading.Thread(target = lambda: results.append(nodes.simplify(x)[1]))
+        thread.start()
+        thread.join()
+        y, reductions = nodes.simplify(x)
+        self.assertEquals("Likes(John,Mary)", str(y))
+        self.assertEquals([ 2, 2 ], results + [ reductions ])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import sqlite3
+
+import earley
+import logic
+import logic_to_sql
+import repl
+
+class LogicToSqlTest(unittest.TestCase):
+    def setUp(self):
+        self.grammar = repl.load_grammar()
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("CREATE TABLE my_consists(arg0 TEXT, arg1 TEXT, arg2 NUMBER)")
+        self.connection.execute("CREATE INDEX my_consists_arg0_arg1 ON my_consists(arg0, arg1)")
+
+    def sql(self, question):
+        semantics = earley.parse_stream(self.grammar, repl.tokenize(question))[0][0].simplify()
+        return list(logic_to_sql.SqlGenerator().make_sql(semantics))
+
+    def execute(self, question):
+        rows = []
+        for query, parameters in self.sql(question):
+            rows.extend(self.connection.execute(query, parameters).fetchall())
+        return rows
+
+    def test_amounts(self):
+        self.assertEquals([ ("INSERT INTO my_consists(arg0, arg1, arg2) VALUES ('Pizza', 'Tomato', ?)", (200,)) ],
+            self.sql("pizza consists of 200 grams of tomato"))
+        self.execute("pizza consists of 200 grams of tomato")
+        self.execute("pizza consists of cheese")
+        self.assertEquals([ (200,) ], self.execute("how much of tomato is in pizza"))
+        self.assertEquals([ (0,) ], self.execute("how much of cheese is in pizza"))
+        self.assertEquals([ (2,) ], self.execute("how many ingredients does pizza consist of"))
+        self.assertEquals([ ("YES",) ], self.execute("does pizza consist of 200 grams of tomato"))
+        self.assertEquals([ ("NO",) ], self.execute("does pizza consist of 100 grams of tomato"))
+
+        # Amounts go with "consist" only.
+        for sentence in [ "pizza takes of 200 grams of tomato", "pizza is of 200 grams of tomato",
+                "tomato costs of 2 grams of cheese" ]:
+            self.assertRaises(earley.ParseError, self.sql, sentence)
+
+        (query, parameters), = self.sql("how much of tomato is in pizza")
+        plan = self.connection.execute("EXPLAIN QUERY PLAN " + query, parameters).fetchall()
+        self.assertTrue("USING INDEX my_consists_arg0_arg1" in plan[0][-1])
+
+    def test_arity(self):
+        generator = logic_to_sql.SqlGenerator()
+        self.assertEquals(("my_consists", 3), (generator.relation("Consists"), generator.arity("Consists")))
+        self.assertRaises(RuntimeError, list, generator.make_sql(logic.parse_logic_expression("Is(Pizza,Vegetarian,Kosher)")))
+
+if __name__ == '__main__':
+    unittest.main()
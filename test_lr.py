@@ -0,0 +1,58 @@
+import unittest
+
+import earley
+import lr
+import repl
+
+class ParseTableTest(unittest.TestCase):
+    def setUp(self):
+        self.grammar = repl.load_grammar()
+        self.table = lr.ParseTable(self.grammar)
+
+    def test_same_parses_as_earley(self):
+        questions = [ line.strip() for line in open("scenario.txt", "r") ]
+        served = 0
+        for question in questions:
+            if not question or question.startswith("."):
+                continue
+            tokens = repl.tokenize(question)
+            try:
+                semantics, tree = self.table.parse(tokens)
+                served += 1
+            except lr.Conflict:
+                continue
+            variant, count = earley.parse_best_stream(self.grammar, tokens)
+            self.assertEquals(1, count)
+            self.assertEquals(str(variant[0]), str(semantics))
+            self.assertEquals(earley.qtree(variant[1]), earley.qtree(tree))
+        self.assertTrue(served > 0)
+
+    def test_ambiguous_question_falls_back(self):
+        tokens = repl.tokenize("does pizza consists of cheese and tomato and cheese")
+        self.assertRaises(lr.Conflict, self.table.parse, tokens)
+        variant, count = lr.parse_best_stream(self.table, tokens)
+        self.assertEquals(2, count)
+
+    def test_failure_falls_back(self):
+        tokens = repl.tokenize("pizza of cheese")
+        self.assertRaises(lr.Conflict, self.table.parse, tokens)
+        try:
+            lr.parse_best_stream(self.table, tokens)
+            self.fail()
+        except earley.ParseError as e:
+            self.assertEquals(1, e.position)
+            self.assertEquals(2, len(earley.recover(self.grammar, e, tokens)))
+
+    def test_conflicts(self):
+        grammar = earley.load_grammar([
+            "S -> NP",
+            "NP -> NP AND NP",
+            "NP -> john",
+            "AND -> and" ])
+        table = lr.ParseTable(grammar)
+        self.assertEquals(1, len(list(table.conflicts())))
+        self.assertEquals(1, lr.parse_best_stream(table, [ "john", "and", "john" ])[1])
+        self.assertEquals(2, lr.parse_best_stream(table, [ "john", "and", "john", "and", "john" ])[1])
+
+if __name__ == '__main__':
+    unittest.main()
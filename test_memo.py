@@ -0,0 +1,31 @@
+import unittest
+
+import memo
+
+class MemoTest(unittest.TestCase):
+    def test_memo(self):
+        calls = []
+        def function(key):
+            calls.append(key)
+            return key.upper()
+        cache = memo.Memo(function, 2)
+        self.assertEquals([ "A", "B", "A" ], [ cache(key) for key in [ "a", "b", "a" ] ])
+        self.assertEquals([ "a", "b" ], calls)
+
+        self.assertEquals("C", cache("c"))
+        self.assertEquals({ "c": "C" }, cache.values)
+
+        cache.forget("c")
+        self.assertEquals(0, len(cache))
+
+    # As if another thread cleared the memo right after every insert.
+    def test_cleared_concurrently(self):
+        class Forgetful(dict):
+            def __setitem__(self, key, value):
+                pass
+        cache = memo.Memo(lambda key: key.upper())
+        cache.values = Forgetful()
+        self.assertEquals("A", cache("a"))
+
+if __name__ == '__main__':
+    unittest.main()
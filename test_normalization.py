@@ -0,0 +1,43 @@
+import unittest
+
+import normalization
+
+class NormalizationTest(unittest.TestCase):
+    def test_stages(self):
+        normalizer = normalization.Normalizer()
+        self.assertEquals([ "do", "pizza", "consist", "of", "tomato" ],
+            normalizer.tokenize("Does pizza consist of tomatoes?"))
+        self.assertEquals([ "tomato", "have", "twenty", "calorie" ], normalizer.tokenize("tomato has twenty calories"))
+        self.assertEquals([ "1,500", "2.5" ], normalizer.tokenize("1,500 2.5."))
+        self.assertEquals([ "what", "is", "vegetarian" ], normalizer.tokenize("what is , vegetarian ?"))
+
+    def test_lemmatize(self):
+        for word, lemma in [ ("dishes", "dish"), ("glasses", "glass"), ("boxes", "box"), ("potatoes", "potato"),
+                ("berries", "berry"), ("takes", "take"), ("hummus", "hummus"), ("pasta", "pasta"),
+                ("has", "have"), ("this", "this"), ("gas", "gas"), ("42s", "42s"), ("pies", "pie"),
+                ("cookies", "cookie"), ("molasses", "molasses"), ("pie", "pie"), ("cookie", "cookie") ]:
+            self.assertEquals(lemma, normalization.lemmatize(word))
+
+    def test_cache(self):
+        calls = []
+        def stage(word):
+            calls.append(word)
+            return word.upper()
+        normalizer = normalization.Normalizer([ stage ])
+        self.assertEquals([ "A", "B", "A" ], normalizer.normalize([ "a", "b", "a" ]))
+        self.assertEquals([ "a", "b" ], calls)
+        normalizer.cache.size = 2
+        normalizer.normalize_word("c")
+        self.assertEquals({ "c": "C" }, normalizer.cache.values)
+
+    # As if another thread cleared the cache right after every insert.
+    def test_cache_cleared_concurrently(self):
+        class Forgetful(dict):
+            def __setitem__(self, key, value):
+                pass
+        normalizer = normalization.Normalizer()
+        normalizer.cache.values = Forgetful()
+        self.assertEquals("dish", normalizer.normalize_word("dishes"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import earley
+import logic_ast_nodes
+import logic_to_sql
+import lr
+import numerals
+import repl
+
+class NumeralsTest(unittest.TestCase):
+    def test_parse_number(self):
+        for words, value in [ ("zero", 0), ("twenty", 20), ("twenty five", 25), ("three hundred", 300),
+                ("three hundred forty two", 342), ("one million two hundred thousand", 1200000),
+                ("seven thousand eleven", 7011), ("20", 20), ("1,500", 1500), ("2.5", 2.5),
+                ("2 million", 2000000), ("2.5 thousand", 2500) ]:
+            self.assertEquals(value, numerals.parse_number(words.split(" ")))
+        for words in [ "five four", "hundred", "twenty zero", "zero thousand", "thousand million",
+                "two thousand three million", "ten hundred", "1.2.3", "pizza" ]:
+            self.assertEquals(None, numerals.parse_number(words.split(" ")))
+
+    def test_lexicon(self):
+        category = numerals.Numerals()
+        self.assertEquals([ ("NUM", "342") ], category.lookup("three hundred forty two"))
+        self.assertEquals([], category.lookup("calorie"))
+        self.assertEquals((), category.productions("twenty", "N"))
+        self.assertTrue(category.continues("three hundred"))
+        self.assertFalse(category.continues("three calorie"))
+        self.assertFalse(category.continues("three", "N"))
+
+        # As if another thread cleared the cache right after every insert.
+        class Forgetful(dict):
+            def __setitem__(self, key, value):
+                pass
+        category.cache.values = Forgetful()
+        self.assertEquals([ ("NUM", "20") ], category.lookup("twenty"))
+
+    def test_parse(self):
+        grammar = repl.load_grammar()
+        table = lr.ParseTable(grammar)
+        for question, value in [ ("tomato has twenty calories", 20), ("tomato has 2,500 calories", 2500),
+                ("tomato has three hundred forty two calories", 342) ]:
+            variants = earley.parse_stream(grammar, repl.tokenize(question))
+            self.assertEquals(1, len(variants))
+            semantics = variants[0][0].simplify()
+            self.assertEquals("Have(Tomato,%d)" % value, str(semantics))
+            self.assertEquals(logic_ast_nodes.Number(value), semantics.argument)
+            (semantics, tree), count = lr.parse_best_stream(table, repl.tokenize(question))
+            self.assertEquals("Have(Tomato,%d)" % value, str(semantics.simplify()))
+
+    def test_sql_parameters(self):
+        grammar = repl.load_grammar()
+        semantics = earley.parse_stream(grammar, repl.tokenize("tomato has twenty calories"))[0][0].simplify()
+        self.assertEquals([ ("INSERT INTO my_have(arg0, arg1) VALUES ('Tomato', ?)", (20,)) ],
+            list(logic_to_sql.SqlGenerator().make_sql(semantics)))
+        semantics = earley.parse_stream(grammar, repl.tokenize("does tomato have twenty calories"))[0][0].simplify()
+        (query, parameters), = logic_to_sql.SqlGenerator().make_sql(semantics)
+        self.assertTrue(query.endswith("alias0_my_have.arg1 = ?"))
+        self.assertEquals((20,), parameters)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import StringIO
+
+import counters
+import repl
+
+class ReplTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        self.repl = repl.SimpleREPL(StringIO.StringIO(), os.path.join(self.directory, "test.db"))
+        self.repl.trace = False
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        self.repl.pool.close()
+        shutil.rmtree(self.directory)
+
+    def scalar(self, query):
+        return self.repl.pool.read(query)[0][0]
+
+    def test_init_twice_with_counters(self):
+        self.repl.cmd_init()
+        self.repl.cmd_counters()
+        self.repl.pool.write("INSERT INTO my_consists(arg0, arg1) VALUES ('Pizza', 'Cheese')")
+        self.repl.pool.write("INSERT INTO my_costs(arg0, arg1) VALUES ('Cheese', 3)")
+        self.repl.cmd_init()
+
+        self.assertEquals(1, self.scalar(counters.make_count_lookup("my_consists", 1, "'Cheese'")))
+        self.assertEquals(1, self.scalar(counters.make_distinct_count_lookup("my_consists", 0)))
+        self.assertEquals(3, self.scalar(counters.make_total_lookup("my_costs", "'Pizza'")))
+
+        self.repl.pool.write("INSERT INTO my_consists(arg0, arg1) VALUES ('Lasagna', 'Cheese')")
+        self.assertEquals(2, self.scalar(counters.make_count_lookup("my_consists", 1, "'Cheese'")))
+        self.assertEquals(3, self.scalar(counters.make_total_lookup("my_costs", "'Lasagna'")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import logic
+import logic_to_sql
+import schema
+
+class SchemaTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "schema.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, predicates):
+        with open(self.path, "w") as output:
+            json.dump({ "predicates": predicates }, output)
+
+    def test_default(self):
+        registry = schema.default()
+        self.assertEquals([ "my_consists", "my_is", "my_takes", "my_have", "my_costs" ], registry.relations())
+        self.assertEquals([ "my_consists", "my_is", "my_have", "my_costs" ], [ predicate.table for predicate in registry.aggregated() ])
+        self.assertEquals([ "Consists", "Costs" ], [ predicate.name for predicate in registry.totals ])
+        self.assertEquals(3, len(registry.predicate("Consists")))
+        self.assertRaises(RuntimeError, registry.predicate, "Hates")
+
+    def test_create(self):
+        predicate = schema.Predicate("Likes", "my_likes", [ "TEXT", "TEXT", "INTEGER" ], [ [ 0, 1 ] ])
+        self.assertEquals([
+            "CREATE TABLE IF NOT EXISTS my_likes(arg0 TEXT, arg1 TEXT, arg2 INTEGER)",
+            "CREATE INDEX IF NOT EXISTS my_likes_arg0_arg1 ON my_likes(arg0, arg1)" ], list(predicate.make_create()))
+        self.assertEquals("ALTER TABLE my_likes ADD COLUMN arg2 INTEGER", list(predicate.make_create([ "arg0", "arg1" ]))[1])
+
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE TABLE my_likes(arg0 TEXT, arg1 TEXT)")
+        for query in predicate.make_create([ row[1] for row in connection.execute("PRAGMA table_info(my_likes)") ]):
+            connection.execute(query)
+        self.assertEquals(3, len(connection.execute("PRAGMA table_info(my_likes)").fetchall()))
+
+    def test_new_predicate(self):
+        self.write([ { "name": "Likes", "table": "my_likes", "columns": [ "TEXT", "TEXT" ], "indexes": [ [ 1 ] ] } ])
+        registry = schema.load(self.path)
+        generator = logic_to_sql.SqlGenerator(registry = registry)
+        self.assertEquals([ ("INSERT INTO my_likes(arg0, arg1) VALUES ('John', 'Mary')", ()) ],
+            list(generator.make_sql(logic.parse_logic_expression("Likes(John,Mary)"))))
+        generator = logic_to_sql.SqlGenerator(use_counters = True, registry = registry)
+        (query, parameters), = generator.make_sql(logic.parse_logic_expression("Count(\\x.Likes(x,Mary))"))
+        self.assertFalse("my_counters" in query)
+
+    def test_invalid(self):
+        for predicates in [
+                [ { "name": "likes", "table": "my_likes", "columns": [ "TEXT" ] } ],
+                [ { "name": "Likes", "table": "my likes", "columns": [ "TEXT" ] } ],
+                [ { "name": "Likes", "table": "my_likes", "columns": [ "BLOB" ] } ],
+                [ { "name": "Likes", "table": "my_likes", "columns": [ "TEXT" ], "indexes": [ [ 1 ] ] } ],
+                [ { "name": "Likes", "table": "my_likes", "columns": [ "TEXT" ] },
+                  { "name": "Likes", "table": "my_loves", "columns": [ "TEXT" ] } ] ]:
+            self.write(predicates)
+            self.assertRaises(RuntimeError, schema.load, self.path)
+        for totals in [ { "parts": "Likes", "costs": "Costs" }, { "parts": "Likes" }, [ "Likes", "Likes" ] ]:
+            with open(self.path, "w") as output:
+                json.dump({ "predicates": [ { "name": "Likes", "table": "my_likes", "columns": [ "TEXT", "TEXT" ] } ],
+                    "totals": totals }, output)
+            self.assertRaises(RuntimeError, schema.load, self.path)
+        with open(self.path, "w") as output:
+            output.write("[")
+        self.assertRaises(RuntimeError, schema.load, self.path)
+
+if __name__ == '__main__':
+    unittest.main()